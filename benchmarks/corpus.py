@@ -0,0 +1,61 @@
+import os
+import random
+
+# 生成正文时使用的常用汉字和标点
+CHARS = (
+    "的一是不了在人有我他这个们中来上大为和国地到以说时要就出会可也你对生能而子那得于着下自之年过发后作里用道行所然家种事成方多经么去法"
+    "学如都同现当没动面起看定天分还进好小部其些主样理心她本前开但因只从想实日军者意无力它与长把机十民第公此已工使情明性知全三又关点正业外将两"
+)
+PUNCTUATION = "，，，。。！？、：；"
+
+# 每个段落的字数范围和每章的段落数
+PARAGRAPH_CHARS = (40, 300)
+CHAPTER_PARAGRAPHS = 30
+
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text):
+    """解析 1M、100M、1G 这样的大小"""
+    text = text.strip().upper()
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def _paragraph(rng):
+    length = rng.randint(*PARAGRAPH_CHARS)
+    chars = []
+    for i in range(length):
+        chars.append(rng.choice(CHARS))
+        if i % 17 == 16:
+            chars.append(rng.choice(PUNCTUATION))
+    return "　　" + "".join(chars) + "。\n"
+
+
+def generate(path, size, encoding, seed=0):
+    """生成约 size 字节、按章节组织的合成小说"""
+    rng = random.Random(seed)
+    # 预先生成一批段落循环使用，生成 1 GB 语料时也不会太慢
+    paragraphs = [_paragraph(rng).encode(encoding) for _ in range(500)]
+    written, chapter = 0, 0
+    with open(path + ".tmp", "wb") as file:
+        while written < size:
+            chapter += 1
+            heading = f"第{chapter}章 合成章节{chapter}\n".encode(encoding)
+            file.write(heading)
+            written += len(heading)
+            for _ in range(CHAPTER_PARAGRAPHS):
+                paragraph = rng.choice(paragraphs)
+                file.write(paragraph)
+                written += len(paragraph)
+    os.replace(path + ".tmp", path)
+
+
+def corpus_path(directory, size, encoding, seed=0):
+    """返回语料文件路径，不存在时生成（已生成的语料在多次运行间复用）"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"corpus-{size}-{encoding}-{seed}.txt")
+    if not os.path.exists(path):
+        generate(path, size, encoding, seed)
+    return path
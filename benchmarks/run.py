@@ -0,0 +1,311 @@
+"""StealthReader 基准测试
+
+在 Qt 的 offscreen 平台下运行，不需要显示器：
+
+    python -m benchmarks.run --sizes 1M,10M,100M --encodings utf-8,gbk --output bench.json
+    python -m benchmarks.run --compare bench.json
+
+对每个语料依次测量：打开文件（冷缓存和热缓存）、滚动到末尾、拖动边缘调整大小、
+拖动透明度滑块更新样式，以及通过模拟按键来源触发全局快捷键的延迟。结果以 JSON 输出，可以与之前的结果比较找出性能回退。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6 import __version__ as pyside_version
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt, QEvent, QPointF
+from PySide6.QtGui import QMouseEvent
+
+from benchmarks.corpus import corpus_path, parse_size
+
+# 单个等待的超时时间（秒）
+WAIT_TIMEOUT = 600
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _summary(samples, prefix):
+    """返回一组耗时样本（秒）的均值和 p95（毫秒）"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        f"{prefix}_mean_ms": _ms(statistics.mean(samples)),
+        f"{prefix}_p95_ms": _ms(p95),
+    }
+
+
+def wait_until(app, predicate, timeout=WAIT_TIMEOUT):
+    """处理事件直到条件满足，返回耗时（秒）"""
+    start = time.perf_counter()
+    while not predicate():
+        app.processEvents()
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("等待超时")
+    return time.perf_counter() - start
+
+
+def bench_load(app, window, path):
+    """打开文件：第一屏、行索引完成、全部后台任务完成的耗时"""
+    previous = window.document
+    start = time.perf_counter()
+    window.load_file(path, 0)
+    wait_until(app, lambda: window.document is not previous
+               and window.text_edit.source is window.document)
+    first_screen = time.perf_counter() - start
+    document = window.document
+    wait_until(app, lambda: document.complete)
+    indexed = time.perf_counter() - start
+    wait_until(app, lambda: window._loader is None)
+    done = time.perf_counter() - start
+    return {
+        "first_screen_ms": _ms(first_screen),
+        "index_ms": _ms(indexed),
+        "background_ms": _ms(done),
+        "lines": document.line_count(),
+        "chapters": len(window.chapters),
+    }
+
+
+def bench_scroll(app, window, steps):
+    """跳到末尾的耗时、从开头逐页滚动时每次滚动并重绘的耗时，以及重绘同一页的耗时"""
+    text_edit = window.text_edit
+    viewport = text_edit.viewport()
+
+    start = time.perf_counter()
+    text_edit.scroll_to_offset(window.document.size)
+    viewport.repaint()
+    app.processEvents()
+    jump = time.perf_counter() - start
+
+    text_edit.scroll_to_offset(0)
+    app.processEvents()
+    samples = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        moved = text_edit.scroll_by(viewport.height())
+        viewport.repaint()
+        samples.append(time.perf_counter() - start)
+        if not moved:
+            break
+
+    repaints = []
+    for _ in range(20):
+        start = time.perf_counter()
+        viewport.repaint()
+        repaints.append(time.perf_counter() - start)
+
+    result = {"jump_to_end_ms": _ms(jump), "scroll_steps": len(samples)}
+    result.update(_summary(samples, "scroll_step"))
+    result.update(_summary(repaints, "repaint"))
+    return result
+
+
+def _mouse_event(window, event_type, x, y, pressed=True):
+    button = Qt.MouseButton.LeftButton
+    buttons = button if pressed else Qt.MouseButton.NoButton
+    local = QPointF(x, y)
+    global_pos = QPointF(window.x() + x, window.y() + y)
+    return QMouseEvent(event_type, local, global_pos, button, buttons,
+                       Qt.KeyboardModifier.NoModifier)
+
+
+def bench_resize(app, window, moves):
+    """通过 mouseMoveEvent 模拟拖动右下角调整大小
+
+    每次移动前等到上一帧的合并定时器结束，使每次移动都实际应用一次几何信息，
+    测得的是一次调整大小（重新排版并重绘）的耗时，而不是事件合并的耗时。
+    """
+    window.resize(800, 600)
+    app.processEvents()
+    counters = dict(window.frameless.counters)
+    x, y = window.width() - 2, window.height() - 2
+
+    start = time.perf_counter()
+    window.mousePressEvent(_mouse_event(window, QEvent.Type.MouseButtonPress, x, y))
+    samples = []
+    frame_timer = window.frameless._frame_timer
+    for i in range(moves):
+        wait_until(app, lambda: not frame_timer.isActive())
+        # 来回拖动，宽度在 800 到 1000 之间变化
+        dx = (i * 4) % 400
+        dx = dx if dx <= 200 else 400 - dx
+        event_start = time.perf_counter()
+        window.mouseMoveEvent(_mouse_event(window, QEvent.Type.MouseMove, x + dx, y + dx // 2))
+        app.processEvents()
+        window.repaint()
+        samples.append(time.perf_counter() - event_start)
+    window.mouseReleaseEvent(_mouse_event(window, QEvent.Type.MouseButtonRelease, x, y, False))
+    app.processEvents()
+    total = time.perf_counter() - start
+
+    result = {"resize_total_ms": _ms(total), "resize_events": moves}
+    result.update(_summary(samples, "resize_event"))
+    for key, value in window.frameless.counters.items():
+        result[f"counter_{key}"] = value - counters.get(key, 0)
+    applied = result["counter_geometry_applied"]
+    result["resize_per_applied_ms"] = _ms(sum(samples) / applied) if applied else None
+    return result
+
+
+def bench_restyle(app, window):
+    """拖动背景透明度滑块，以及单次更新样式并重绘的耗时"""
+    from src.settings import SettingsDialog
+
+    dialog = SettingsDialog(window)
+    start = time.perf_counter()
+    for value in range(256):
+        dialog.bgAlphaSlider.setValue(value)
+        app.processEvents()
+    wait_until(app, lambda: not window._style_timer.isActive())
+    drag = time.perf_counter() - start
+    dialog.reject()
+
+    samples = []
+    for value in range(0, 256, 8):
+        start = time.perf_counter()
+        window.bg_alpha = value
+        window.update_styles()
+        window.repaint()
+        samples.append(time.perf_counter() - start)
+
+    result = {"slider_drag_ms": _ms(drag)}
+    result.update(_summary(samples, "restyle_frame"))
+    return result
+
+
+def bench_hotkey(app, window, presses):
+    """在另一个线程中模拟按下快捷键，测量从钩子回调到动作完成的延迟"""
+    dispatcher = window.hotkey_dispatcher
+    backend = dispatcher.backend
+    latencies = []
+    collect = lambda action, latency: latencies.append(latency)
+    dispatcher.handled.connect(collect)
+    result = {}
+    for action in ("boss", "page_down"):
+        combo = dispatcher.bindings[action]
+        del latencies[:]
+        for i in range(presses):
+            thread = threading.Thread(target=backend.trigger, args=(combo,))
+            thread.start()
+            thread.join()
+            wait_until(app, lambda: len(latencies) > i)
+        result.update(_summary(latencies, f"hotkey_{action}"))
+    dispatcher.handled.disconnect(collect)
+    if not window.isVisible():
+        window.show()
+        app.processEvents()
+    return result
+
+
+def run(args):
+    from src.main_window import MainWindow
+    from src.hotkeys import FakeBackend
+    from src.state import StateStore
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    work_dir = tempfile.mkdtemp(prefix="stealthreader-bench-")
+    corpus_dir = args.corpus_dir or os.path.join(tempfile.gettempdir(), "stealthreader-corpus")
+
+    # 设置和缓存都放在临时目录，不影响用户数据，并保证第一次打开是冷缓存
+    settings = StateStore(os.path.join(work_dir, "state"))
+    cache_env = "LOCALAPPDATA" if sys.platform == "win32" else "XDG_CACHE_HOME"
+    os.environ[cache_env] = os.path.join(work_dir, "cache")
+
+    window = MainWindow(headless=True, settings=settings, hotkey_backend=FakeBackend())
+    window.show()
+    window.setup_global_hotkey()
+    app.processEvents()
+
+    results = []
+    for size_text in args.sizes.split(","):
+        size = parse_size(size_text)
+        for encoding in args.encodings.split(","):
+            path = corpus_path(corpus_dir, size, encoding)
+            metrics = {"file_size": os.path.getsize(path)}
+            for key, value in bench_load(app, window, path).items():
+                metrics[f"cold_{key}"] = value
+            for key, value in bench_load(app, window, path).items():
+                metrics[f"warm_{key}"] = value
+            metrics.update(bench_scroll(app, window, args.scroll_steps))
+            metrics.update(bench_resize(app, window, args.resize_moves))
+            metrics.update(bench_restyle(app, window))
+            metrics.update(bench_hotkey(app, window, args.hotkey_presses))
+            results.append({"size": size_text, "encoding": encoding, "metrics": metrics})
+            print(f"{size_text} {encoding}: {json.dumps(metrics, ensure_ascii=False)}",
+                  file=sys.stderr)
+
+    window.close()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pyside": pyside_version,
+            "platform": platform.platform(),
+            "qpa": os.environ.get("QT_QPA_PLATFORM"),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """比较两次结果中所有 *_ms 指标，返回回退列表"""
+    previous = {(item["size"], item["encoding"]): item["metrics"] for item in baseline["results"]}
+    regressions = []
+    for item in current["results"]:
+        old = previous.get((item["size"], item["encoding"]))
+        if old is None:
+            continue
+        for key, value in item["metrics"].items():
+            if not key.endswith("_ms") or key not in old or old[key] <= 0:
+                continue
+            change = value / old[key] - 1
+            if change > threshold:
+                regressions.append((item["size"], item["encoding"], key, old[key], value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StealthReader 基准测试")
+    parser.add_argument("--sizes", default="1M,10M,100M", help="语料大小，逗号分隔，如 1M,10M,1G")
+    parser.add_argument("--encodings", default="utf-8,gbk", help="语料编码，逗号分隔")
+    parser.add_argument("--corpus-dir", help="语料缓存目录（默认在系统临时目录）")
+    parser.add_argument("--scroll-steps", type=int, default=50, help="连续滚动的最大次数")
+    parser.add_argument("--resize-moves", type=int, default=200, help="模拟拖动的鼠标移动次数")
+    parser.add_argument("--hotkey-presses", type=int, default=20, help="每个快捷键模拟按下的次数")
+    parser.add_argument("--output", help="结果输出文件（默认输出到标准输出）")
+    parser.add_argument("--compare", help="与之前的结果文件比较")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定为回退的相对变慢比例")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(result, json.load(file), args.threshold)
+        for size, encoding, key, old, new, change in regressions:
+            print(f"回退 {size} {encoding} {key}: {old} -> {new} ms (+{change:.0%})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,41 @@
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt
+import time
+
+# 尽早记录启动时间，用于统计首次绘制耗时
+START_TIME = time.perf_counter()
+
+import argparse
+import os
 import sys
-import ctypes
-import keyboard
 
 from src.utils import is_admin
-from src.main_window import MainWindow
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="StealthReader")
+    parser.add_argument("file", nargs="?", help="要打开的文件")
+    parser.add_argument("--offset", type=int, help="从这个字节偏移开始阅读（默认为上次的阅读位置）")
+    parser.add_argument("--new-instance", action="store_true", help="不把文件交给已经运行的实例")
+    # 其余参数（如 Qt 的命令行选项）留给 QApplication
+    args, _ = parser.parse_known_args()
+    if args.file:
+        args.file = os.path.abspath(args.file)
+    return args
+
 
 if __name__ == '__main__':
+    args = parse_args()
+    
+    # 已经有实例在运行时，把文件交给它打开后立即退出，不再创建界面和全局快捷键
+    if not args.new_instance:
+        from src.instance import forward_to_running
+        if forward_to_running(args.file, args.offset):
+            sys.exit(0)
+    
     # 检查是否已以管理员身份运行，如果不是，尝试重新启动
-    if not is_admin() and sys.platform == 'win32':
+    # （在导入界面之前检查，需要重新启动时不必先加载整个界面）
+    if sys.platform == 'win32' and not is_admin():
+        import ctypes
+        
         # 显示提示消息
         ctypes.windll.user32.MessageBoxW(0, 
             "全局快捷键功能需要管理员权限。\n程序将尝试以管理员身份重新启动。", 
@@ -32,7 +58,22 @@ if __name__ == '__main__':
         except:
             pass
 
+    from PySide6.QtWidgets import QApplication
+    from src.instance import InstanceServer, forward_to_running
+    from src.main_window import MainWindow
+
     app = QApplication(sys.argv)
-    window = MainWindow()
+    # 在创建窗口之前开始监听，之后的启动把文件转发过来；连接在窗口创建后才会处理
+    if not args.new_instance:
+        server = InstanceServer(lambda path, offset: window.open_forwarded(path, offset), app)
+        if not server.listen():
+            # 从启动时的检查到这里之间，同时启动的另一个实例已经开始监听
+            if forward_to_running(args.file, args.offset):
+                sys.exit(0)
+            if not server.listen_replacing_stale():
+                # 之后的启动会各自打开新窗口，不影响本次使用
+                print(f"无法接收其他启动转发的文件: {server.error_string()}", file=sys.stderr)
+    # 窗口先显示上次阅读的页面，托盘和全局快捷键在首次绘制后再初始化
+    window = MainWindow(START_TIME, file_path=args.file, offset=args.offset)
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,102 @@
+"""批量预处理文本文件
+
+在多个进程中为目录下的每本书检测编码、（可选）清理文本、建立行索引、章节索引和搜索索引，
+结果写入阅读器使用的文件缓存，之后在阅读器中打开时直接读取缓存。
+文件的大小和修改时间没有变化时跳过。
+
+用法：python preprocess.py 目录或文件 [...] [--jobs N] [--cleanup-rules 规则,...]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 默认处理的扩展名（与打开文件对话框一致）
+EXTENSIONS = ('.txt', '.gz', '.bz2', '.xz', '.zip', '.epub', '.html', '.htm')
+# 全部完成后写入的标记文件，记录处理时使用的清理规则
+MARKER = 'preprocessed.json'
+
+
+def iter_files(paths, extensions):
+    """列出参数中的文件和目录树下扩展名匹配的文件"""
+    for path in paths:
+        if os.path.isfile(path):
+            yield os.path.abspath(path)
+            continue
+        for root, _, names in os.walk(path):
+            for name in sorted(names):
+                if name.lower().endswith(extensions):
+                    yield os.path.abspath(os.path.join(root, name))
+
+
+def preprocess_file(file_path, rules=(), ad_patterns=(), force=False):
+    """预处理一个文件，返回 (文件路径, 状态, 耗时秒数)，状态为 done/skipped/failed: 原因"""
+    from src.cache import FileCache
+    from src.chapters import load_chapters
+    from src.cleanup import cleaned_document, rules_key
+    from src.document import open_document
+    from src.search import load_search_index
+
+    start = time.perf_counter()
+    try:
+        # 缓存键包含文件的大小和修改时间，文件没有变化时标记仍在
+        cache = FileCache(file_path)
+        expected = {'cleanup': rules_key(rules, ad_patterns) if rules else None}
+        if not force and cache.load_json(MARKER) == expected:
+            return file_path, 'skipped', time.perf_counter() - start
+
+        document = open_document(file_path)
+        try:
+            if rules and document.RANDOM_ACCESS:
+                document = cleaned_document(document, rules, ad_patterns)
+            if not document.load_cached_index():
+                document.build_index()
+                document.save_index()
+            load_chapters(document)
+            load_search_index(document)
+        finally:
+            document.close()
+        cache.save_json(MARKER, expected)
+    except Exception as e:
+        return file_path, f'failed: {e}', time.perf_counter() - start
+    return file_path, 'done', time.perf_counter() - start
+
+
+def main():
+    from src.cleanup import RULES
+
+    parser = argparse.ArgumentParser(description="批量预处理文本文件，写入阅读器的文件缓存")
+    parser.add_argument("paths", nargs="+", help="要处理的目录或文件")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="并行进程数（默认为 CPU 核数）")
+    parser.add_argument("--extensions", default=",".join(EXTENSIONS), help="处理的扩展名，逗号分隔")
+    parser.add_argument("--cleanup-rules", default="",
+                        help=f"文本清理规则，逗号分隔，应与阅读器设置一致（可选：{','.join(RULES)}）")
+    parser.add_argument("--ad-pattern", default="", help="额外的广告关键词（正则表达式），应与阅读器设置一致")
+    parser.add_argument("--force", action="store_true", help="即使文件没有变化也重新处理")
+    args = parser.parse_args()
+
+    rules = tuple(name for name in args.cleanup_rules.split(",") if name)
+    unknown = [name for name in rules if name not in RULES]
+    if unknown:
+        parser.error(f"未知的清理规则: {','.join(unknown)}")
+    ad_patterns = (args.ad_pattern,) if args.ad_pattern else ()
+    extensions = tuple(ext.strip().lower() for ext in args.extensions.split(",") if ext.strip())
+
+    files = list(dict.fromkeys(iter_files(args.paths, extensions)))
+    counts = {'done': 0, 'skipped': 0, 'failed': 0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(preprocess_file, path, rules, ad_patterns, args.force) for path in files]
+        for i, future in enumerate(as_completed(futures), 1):
+            path, status, elapsed = future.result()
+            counts[status.split(':')[0]] += 1
+            if status != 'skipped':
+                print(f"[{i}/{len(files)}] {status} {elapsed:.2f}s {path}", file=sys.stderr if status != 'done' else sys.stdout)
+    print(f"完成 {counts['done']}，跳过 {counts['skipped']}，失败 {counts['failed']}，"
+          f"耗时 {time.perf_counter() - start:.1f}s")
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import sys
+
+
+def cache_root():
+    """返回缓存根目录"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'StealthReader')
+
+
+def file_key(file_path, stat=None):
+    """由路径、大小和修改时间生成缓存键，文件变化后键随之改变"""
+    stat = stat or os.stat(file_path)
+    raw = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class FileCache:
+    """单个文件的磁盘缓存目录，存放编码、索引等派生数据"""
+
+    def __init__(self, file_path, stat=None, root=None):
+        self.key = file_key(file_path, stat)
+        self.directory = os.path.join(root or cache_root(), self.key[:2], self.key)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def load_bytes(self, name):
+        """读取缓存文件，不存在或读取失败时返回 None"""
+        try:
+            with open(self.path(name), 'rb') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def save_bytes(self, name, data):
+        """原子地写入缓存文件，写入失败时静默忽略"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self.path(name + '.tmp')
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, self.path(name))
+        except OSError:
+            pass
+
+    def load_json(self, name):
+        data = self.load_bytes(name)
+        if data is None:
+            return None
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError:
+            return None
+
+    def save_json(self, name, value):
+        self.save_bytes(name, json.dumps(value, ensure_ascii=False).encode('utf-8'))
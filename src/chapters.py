@@ -0,0 +1,47 @@
+import re
+
+# 章节标题：整行较短，以“第N章/节/回/卷…”或常见的特殊标题开头
+CHAPTER_PATTERN = re.compile(
+    r'^[ \t　]*('
+    r'(?:第[0-9０-９零〇一二两三四五六七八九十百千万]+[章节回卷集部篇]'
+    r'|序章|序言|楔子|引子|尾声|后记|番外|Chapter\s*\d+)'
+    r'[^\n]{0,40})$',
+    re.MULTILINE,
+)
+
+# 每次解码扫描的行数
+SCAN_LINES = 20000
+
+
+def scan_chapters(document, cancelled=None, start_line=0):
+    """单次流式扫描文档（从 start_line 行开始），返回 [(字节偏移, 标题), ...]
+
+    cancelled 为可选的回调，返回 True 时中止扫描并返回 None。
+    """
+    chapters = []
+    total = document.line_count()
+    for start in range(start_line, total, SCAN_LINES):
+        if cancelled is not None and cancelled():
+            return None
+        end = min(total, start + SCAN_LINES)
+        text = document.get_text(start, end)
+        line, pos = start, 0
+        for match in CHAPTER_PATTERN.finditer(text):
+            line += text.count('\n', pos, match.start())
+            pos = match.start()
+            chapters.append((document.offset_of_line(line), match.group(1).strip()))
+    return chapters
+
+
+def load_chapters(document, cancelled=None):
+    """读取文件自带的目录或缓存的章节索引，都没有时扫描并写入缓存"""
+    toc = document.table_of_contents()
+    if toc:
+        return toc
+    cached = document.cache.load_json('chapters.json')
+    if cached is not None:
+        return [tuple(item) for item in cached]
+    chapters = scan_chapters(document, cancelled)
+    if chapters is not None:
+        document.cache.save_json('chapters.json', chapters)
+    return chapters
@@ -0,0 +1,374 @@
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from src.cache import FileCache
+from src.document import Document
+
+# 常见的网文广告和站点水印
+AD_PATTERNS = (
+    r'https?://|www\.|\.(?:com|net|org|cc|la|info)\b',
+    r'笔趣阁|顶点小说|天才一秒记住|手机阅读|请收藏|最新章节|本章未完|点击下一页|求月票|求推荐票',
+)
+
+# 普通空白、全角空格、不换行空格和 BOM
+PADDING = ' \t\u3000\u00a0\ufeff'
+
+
+def split_line_endings(lines):
+    """统一换行符：拆分单独的 \\r（旧 Mac 格式）"""
+    for line in lines:
+        if '\r' in line:
+            yield from line.split('\r')
+        else:
+            yield line
+
+
+def strip_padding(lines):
+    """去除行首行尾的空白和全角空格"""
+    for line in lines:
+        yield line.strip(PADDING)
+
+
+def indent_paragraphs(lines):
+    """非空行以两个全角空格缩进"""
+    for line in lines:
+        yield '　　' + line if line else line
+
+
+def collapse_blank_lines(lines, blank=True):
+    """连续的空行只保留一行，并去掉开头的空行
+
+    从中间续接清理时，blank 表示之前的最后一行是否为空行（或之前没有内容）。
+    """
+    for line in lines:
+        if line.strip(PADDING):
+            blank = False
+            yield line
+        elif not blank:
+            blank = True
+            yield ''
+
+
+def remove_ads(lines, patterns=()):
+    """去除包含广告关键词的行"""
+    pattern = re.compile('|'.join(f'(?:{item})' for item in AD_PATTERNS + tuple(patterns)))
+    search = pattern.search
+    for line in lines:
+        if not search(line):
+            yield line
+
+
+# 规则名称 -> (说明, 生成器函数)，按这里的顺序应用
+RULES = {
+    'line_endings': ('统一换行符', split_line_endings),
+    'remove_ads': ('去除广告行', remove_ads),
+    'strip_padding': ('去除行首行尾空白', strip_padding),
+    'indent': ('段首缩进两个全角空格', indent_paragraphs),
+    'collapse_blank_lines': ('合并连续空行', collapse_blank_lines),
+}
+
+
+def clean_lines(lines, rules, ad_patterns=(), blank=True):
+    """把各规则的生成器串联起来，逐行处理
+
+    blank 为之前清理出的最后一行是否为空行，用于从中间续接清理。
+    """
+    for name in RULES:
+        if name not in rules:
+            continue
+        rule = RULES[name][1]
+        if name == 'remove_ads':
+            lines = rule(lines, ad_patterns)
+        elif name == 'collapse_blank_lines':
+            lines = rule(lines, blank)
+        else:
+            lines = rule(lines)
+    return lines
+
+
+class SourceLines:
+    """按块增量解码文档并逐行产出（不含换行符），跨块的行和多字节字符会被拼接
+
+    line_start 是最近产出的一行在原文档中的起始字节偏移，清理规则逐行处理、
+    不预读后面的行，因此也是清理结果中最近产出的一行所对应的原文位置。
+    start 为开始读取的行首偏移，默认从文本开头读取；
+    progress 不为空时，每读取一块以已读取的字节数调用一次。
+    """
+
+    def __init__(self, document, start=None, chunk_size=1024 * 1024, progress=None):
+        self.document = document
+        self.start = document.data_start if start is None else start
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.line_start = self.start
+
+    def __iter__(self):
+        document = self.document
+        newline = document._newline
+        unit = len(newline)
+        decoder = codecs.getincrementaldecoder(document.encoding)(errors='replace')
+        pos, size = self.start, document.size
+        # 尚未结束的行的起始偏移
+        start = pos
+        rest = ''
+        while pos < size:
+            end = min(pos + self.chunk_size, size)
+            raw = document.get_bytes(pos, end)
+            text = rest + decoder.decode(raw, final=end >= size)
+            lines = text.split('\n')
+            rest = lines.pop()
+            # 各行结束处换行符之后的偏移，用于记录下一行的起始位置
+            ends = []
+            i = raw.find(newline)
+            while i != -1:
+                if (pos + i - document.data_start) % unit == 0:
+                    ends.append(pos + i + unit)
+                i = raw.find(newline, i + 1)
+            pos = end
+            if self.progress is not None:
+                self.progress(pos)
+            for k, line in enumerate(lines):
+                self.line_start = start
+                if k < len(ends):
+                    start = ends[k]
+                yield line[:-1] if line.endswith('\r') else line
+        if rest:
+            self.line_start = start
+            yield rest
+
+
+def rules_key(rules, ad_patterns=()):
+    """规则集的缓存键"""
+    raw = json.dumps([sorted(rules), list(ad_patterns)], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def load_source_lines(raw):
+    """解析缓存的行位置对照表（清理结果中各行的起始偏移，之后是对应原文行的起始偏移）"""
+    if raw is None or len(raw) % 16:
+        return None
+    starts = array('Q')
+    starts.frombytes(raw)
+    source_starts = starts[len(starts) // 2:]
+    del starts[len(starts) // 2:]
+    return starts, source_starts
+
+
+def cleaned_document(document, rules, ad_patterns=()):
+    """返回按规则清理后的文档
+
+    清理结果以 UTF-8 写入原文件的缓存目录，按规则集区分，同时保存各行与原文行的位置对照，
+    阅读位置按原文件中的偏移保存。
+    已经完整清理过时直接打开缓存的结果，否则边清理边建立索引。
+    缓存目录无法写入时返回原文档。
+    """
+    name = f'clean-{rules_key(rules, ad_patterns)}'
+    meta = document.cache.load_json(name + '.json')
+    source_lines = load_source_lines(document.cache.load_bytes(name + '.map'))
+    try:
+        if (meta is not None and source_lines is not None
+                and os.path.getsize(document.cache.path(name + '.txt')) == meta.get('size')):
+            return CleanedText(document, rules, ad_patterns, name, source_lines)
+    except OSError:
+        pass
+    try:
+        return CleanedDocument(document, rules, ad_patterns, name)
+    except OSError:
+        return document
+
+
+class CleanedText(Document):
+    """已经清理完成、缓存在原文件缓存目录中的文本
+
+    原文件末尾追加内容时（跟随模式），从原文的最后一行开始只清理新增的部分，
+    清理结果中由这一行产生的行先截掉再追加，行索引和位置对照表随之更新，
+    不必重新清理整个文件。
+    行偏移是相对清理后文本（UTF-8）的字节偏移。
+    """
+
+    # 每次写入的行数
+    BATCH_LINES = 5000
+
+    def __init__(self, source, rules, ad_patterns, name, source_lines, mode='r+b'):
+        self.source = source
+        self.file_path = source.file_path
+        self.source_key = source.cache.key
+        self.encoding = 'utf-8'
+        self.data_start = 0
+        self._newline = b'\n'
+        self._name = name
+        self._rules = sorted(rules)
+        self._ad_patterns = tuple(ad_patterns)
+        self._output_path = source.cache.path(name + '.txt')
+        self._file = open(self._output_path, mode)
+        stat = os.fstat(self._file.fileno())
+        self.size = stat.st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.cache = FileCache(self._output_path, stat)
+        self.line_offsets = array('Q', [0])
+        self.soft_lines = array('Q')
+        self._indexed = 0
+        self.source_lines = source_lines
+        # 尚未写入的清理结果（逐行的生成器），以及产出各行原文位置的读取器
+        self._lines = None
+        self._reader = None
+
+    @property
+    def complete(self):
+        return self._lines is None and self._indexed >= self.size
+
+    def iter_index(self, chunk_size=None):
+        """有待写入的清理结果时，每清理出一批行，写入缓存文件并建立索引，产出已索引的字节数"""
+        if self._lines is None:
+            yield from super().iter_index(chunk_size)
+            return
+        while self._lines is not None:
+            batch, starts = [], []
+            for line in self._lines:
+                batch.append(line)
+                starts.append(self._reader.line_start)
+                if len(batch) >= self.BATCH_LINES:
+                    break
+            if batch:
+                self._append(batch, starts)
+            if len(batch) < self.BATCH_LINES:
+                self._finish()
+            yield self._indexed
+
+    def _append(self, lines, source_starts):
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        start = self.size
+        self._file.seek(start)
+        self._file.write(data)
+        self._file.flush()
+        # 旧的映射可能仍被界面线程引用，不主动关闭，由垃圾回收释放
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = start + len(data)
+        limit = self.BLOCK_GRID
+        offsets = self.line_offsets
+        starts = self.source_lines[0]
+        # 先追加原文位置，界面线程换算时对照表的两列总是够用
+        self.source_lines[1].extend(source_starts)
+        i = data.find(b'\n')
+        while i != -1:
+            # 拆分过长的行之前，最后一个行偏移就是这一行的起始位置
+            starts.append(offsets[-1])
+            if start + i - offsets[-1] > limit:
+                self.split_long_line(start + i)
+            offsets.append(start + i + 1)
+            i = data.find(b'\n', i + 1)
+        self._indexed = self.size
+
+    def _finish(self):
+        self._lines = None
+        self._reader = None
+        source_cache = self.source.cache
+        output_path = source_cache.path(self._name + '.txt')
+        if output_path != self._output_path:
+            # 原文件追加内容后缓存键改变，清理结果移到新的缓存目录
+            try:
+                os.makedirs(source_cache.directory, exist_ok=True)
+                os.replace(self._output_path, output_path)
+            except OSError:
+                return
+            self._output_path = output_path
+        stat = os.fstat(self._file.fileno())
+        self.cache = FileCache(self._output_path, stat)
+        self.source_key = source_cache.key
+        # 下次打开时直接映射清理结果并读取行索引和位置对照表
+        self.save_index()
+        starts, source_starts = self.source_lines
+        source_cache.save_bytes(self._name + '.map', starts.tobytes() + source_starts.tobytes())
+        source_cache.save_json(self._name + '.json', {'size': self.size, 'rules': self._rules})
+
+    def grow(self):
+        """原文件末尾追加了内容时，截掉需要重新清理的行，新增的行在 build_index 时清理写入
+
+        返回正数表示清理结果将会改变，没有新内容时返回 0，
+        原文件变小或被替换为另一个文件时返回 -1，需要重新打开。
+        """
+        source = self.source
+        previous = source.size
+        grown = source.grow()
+        if grown <= 0:
+            return grown
+
+        # 原文的最后一行可能尚未写完，从这一行的行首重新清理
+        starts, source_starts = self.source_lines
+        newline = source._newline
+        unit = len(newline)
+        resume = previous
+        if previous > source.data_start and source.get_bytes(previous - unit, previous) != newline:
+            # 这一行不早于清理结果最后一行对应的原文行
+            resume = source_starts[-1] if source_starts else source.data_start
+            i = source._data.rfind(newline, resume, previous)
+            while i != -1 and (i - source.data_start) % unit:
+                i = source._data.rfind(newline, resume, i + unit - 1)
+            if i != -1:
+                resume = i + unit
+
+        # 截掉由这一行产生的清理结果
+        count = bisect_left(source_starts, resume)
+        cut = starts[count] if count < len(starts) else self.size
+        # 之前的最后一行是否为空行，合并空行的规则从这个状态续接
+        blank = count == 0 or not self._data[starts[count - 1]:cut].decode('utf-8', errors='replace').strip(PADDING + '\n')
+        removed = self.size - cut
+        line = bisect_left(self.line_offsets, cut)
+        del self.line_offsets[line + 1:]
+        del self.soft_lines[bisect_right(self.soft_lines, line):]
+        del starts[count:]
+        del source_starts[count:]
+        # 截短文件前先关闭映射，访问超出文件末尾的映射会出错
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b''
+        self._file.truncate(cut)
+        if cut:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = self._indexed = cut
+
+        self._reader = SourceLines(source, start=resume)
+        self._lines = clean_lines(self._reader, self._rules, self._ad_patterns, blank)
+        return removed + grown
+
+    def trim(self):
+        super().trim()
+        self.source.trim()
+
+    def close(self):
+        super().close()
+        self.source.close()
+
+
+class CleanedDocument(CleanedText):
+    """边清理边显示的文档
+
+    建立索引时从原文档按块解码，经过清理规则的生成器后追加写入缓存文件，
+    重新映射缓存文件并为新增的行建立索引，因此第一屏可以在清理完成前显示。
+    全部完成后写入标记文件，下次打开时直接映射缓存的结果（CleanedText）。
+    """
+
+    # 清理到某个位置之前无法按偏移读取
+    RANDOM_ACCESS = False
+
+    def __init__(self, source, rules, ad_patterns, name):
+        os.makedirs(source.cache.directory, exist_ok=True)
+        super().__init__(source, rules, ad_patterns, name, (array('Q'), array('Q')), mode='w+b')
+        # 派生数据（章节、搜索索引）在清理完成后按清理结果的文件缓存
+        self.cache = source.cache
+        self._read = source.data_start
+        self._reader = SourceLines(source, progress=self._on_read)
+        self._lines = clean_lines(self._reader, rules, ad_patterns)
+
+    def _on_read(self, pos):
+        self._read = pos
+
+    def load_progress(self):
+        """以原文档的读取进度表示加载进度"""
+        return self._read, self.source.size
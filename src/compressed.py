@@ -0,0 +1,391 @@
+import bz2
+import lzma
+import os
+import struct
+import tempfile
+import threading
+import zipfile
+import zlib
+from array import array
+from collections import OrderedDict
+
+from src.cache import FileCache
+from src.document import Document
+from src.encoding import bom_length
+
+# 支持的压缩格式（按扩展名判断）
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz', '.zip')
+
+
+def is_compressed(file_path):
+    return file_path.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+class _Stored:
+    """未压缩的数据（zip 中的 stored 成员），与解压器接口一致"""
+
+    eof = False
+    unused_data = b''
+
+    def decompress(self, data):
+        return data
+
+    def copy(self):
+        return self
+
+
+class DecompressedData:
+    """压缩文件解压后的内容，支持按字节区间随机读取
+
+    顺序扫描（scan）或按需解压时每隔约 SEEK_INTERVAL 字节记录一个检查点：
+    压缩数据的位置、解压后的位置和解压器状态的副本。
+    随机读取时从不超过目标位置的最近检查点开始解压，不必每次从头解压。
+    bz2 和 xz 的解压器无法复制状态，扫描时把解压出的块依次写入一个临时文件，
+    随机读取时直接从临时文件读取（临时文件在关闭后自动删除）。
+    解压后的数据按 BLOCK_SIZE 分块，最近用到的块保存在 LRU 缓存中。
+    """
+
+    # 解压后的分块大小，是 4 的倍数，多字节换行符不会跨块
+    BLOCK_SIZE = 1024 * 1024
+    # 缓存的块数
+    CACHE_BLOCKS = 32
+    # 检查点间隔（解压后的字节数）
+    SEEK_INTERVAL = 4 * 1024 * 1024
+    # 每次读取的压缩数据大小
+    READ_SIZE = 256 * 1024
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.compressed_size = os.path.getsize(file_path)
+        # 压缩数据的字节区间
+        self._start, self._end = 0, self.compressed_size
+        self._multi_stream = True
+        lower = file_path.lower()
+        if lower.endswith('.gz'):
+            # 自动识别 gzip 和 zlib 头
+            self._new_decompressor = lambda: zlib.decompressobj(zlib.MAX_WBITS | 32)
+        elif lower.endswith('.bz2'):
+            self._new_decompressor = bz2.BZ2Decompressor
+        elif lower.endswith('.xz'):
+            self._new_decompressor = lzma.LZMADecompressor
+        elif lower.endswith('.zip'):
+            self._open_zip_member()
+        else:
+            raise ValueError(f"不支持的压缩格式: {file_path}")
+
+        # 检查点：[(压缩数据位置, 解压后位置, 解压器副本)]，解压器为空表示从头开始
+        self._points = [(self._start, 0, None)]
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        # 无法记录检查点时使用的临时文件，以及其中已写入的字节数
+        self._spool_file = None
+        self._spooled = 0
+        if not hasattr(self._new_decompressor(), 'copy'):
+            self._spool_file = tempfile.TemporaryFile()
+        # 顺序扫描的进度（压缩数据位置）以及是否已经解压到末尾
+        self.scanned = self._start
+        self.eof = False
+        self.size = 0
+
+    def _open_zip_member(self):
+        """选择 zip 中的第一个 .txt 成员（没有时选最大的文件），定位其压缩数据"""
+        with zipfile.ZipFile(self.file_path) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir()]
+            if not members:
+                raise ValueError("压缩包中没有文件")
+            texts = [info for info in members if info.filename.lower().endswith('.txt')]
+            info = texts[0] if texts else max(members, key=lambda item: item.file_size)
+        if info.flag_bits & 0x1:
+            raise ValueError("不支持加密的压缩包")
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            self._new_decompressor = lambda: zlib.decompressobj(-zlib.MAX_WBITS)
+        elif info.compress_type == zipfile.ZIP_STORED:
+            self._new_decompressor = _Stored
+        elif info.compress_type == zipfile.ZIP_BZIP2:
+            self._new_decompressor = bz2.BZ2Decompressor
+        else:
+            raise ValueError(f"不支持的压缩方式: {info.compress_type}")
+        self._multi_stream = False
+
+        # 本地文件头：30 字节固定部分，之后是文件名和扩展字段
+        with open(self.file_path, 'rb') as file:
+            file.seek(info.header_offset)
+            header = file.read(30)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        self._start = info.header_offset + 30 + name_length + extra_length
+        self._end = self._start + info.compress_size
+
+    def _decompress(self, point):
+        """从检查点开始顺序解压，产出 (解压后的数据, 压缩数据位置, 当前解压器)"""
+        position, _, decompressor = point
+        decompressor = decompressor.copy() if decompressor is not None else self._new_decompressor()
+        with open(self.file_path, 'rb') as file:
+            file.seek(position)
+            while position < self._end:
+                raw = file.read(min(self.READ_SIZE, self._end - position))
+                if not raw:
+                    break
+                position += len(raw)
+                data = b''
+                while raw:
+                    if decompressor.eof:
+                        if not self._multi_stream:
+                            break
+                        # 多个压缩流首尾相接（如多成员 gzip），末尾的填充数据不是新的流
+                        decompressor = self._new_decompressor()
+                        try:
+                            data += decompressor.decompress(raw)
+                        except (OSError, EOFError, zlib.error, lzma.LZMAError):
+                            self._end = position
+                            break
+                    else:
+                        data += decompressor.decompress(raw)
+                    raw = decompressor.unused_data if decompressor.eof else b''
+                yield data, position, decompressor
+                if decompressor.eof and not self._multi_stream:
+                    break
+
+    def _checkpoint(self, position, output, decompressor):
+        """记录检查点，解压器无法复制时跳过"""
+        copy = getattr(decompressor, 'copy', None)
+        with self._lock:
+            if copy is not None and output > self._points[-1][1]:
+                self._points.append((position, output, copy()))
+
+    def _point_before(self, offset):
+        """返回解压后位置不超过 offset 的最近检查点"""
+        best = self._points[0]
+        for point in self._points:
+            if point[1] > offset:
+                break
+            best = point
+        return best
+
+    def _cache_block(self, index, block):
+        with self._lock:
+            self._blocks[index] = block
+            self._blocks.move_to_end(index)
+            while len(self._blocks) > self.CACHE_BLOCKS:
+                self._blocks.popitem(last=False)
+
+    def scan(self, offset=0):
+        """从 offset 所在的块开始顺序解压到末尾，产出 (块起始位置, 块数据)
+
+        扫描过程中记录检查点、更新已知大小，并把解压出的块放入缓存。
+        """
+        block_size = self.BLOCK_SIZE
+        index = offset // block_size
+        point = self._point_before(index * block_size)
+        output = point[1]
+        buffer = bytearray()
+        skip = index * block_size - output
+        next_point = output + self.SEEK_INTERVAL
+        for data, position, decompressor in self._decompress(point):
+            output += len(data)
+            if skip:
+                cut = min(skip, len(data))
+                data = data[cut:]
+                skip -= cut
+            buffer += data
+            while len(buffer) >= block_size:
+                block = bytes(buffer[:block_size])
+                del buffer[:block_size]
+                self._cache_block(index, block)
+                self._spool(index * block_size, block)
+                self.size = max(self.size, (index + 1) * block_size)
+                yield index * block_size, block
+                index += 1
+            self.scanned = max(self.scanned, position)
+            if output >= next_point:
+                self._checkpoint(position, output, decompressor)
+                next_point = output + self.SEEK_INTERVAL
+        if buffer:
+            block = bytes(buffer)
+            self._cache_block(index, block)
+            self._spool(index * block_size, block)
+            self.size = max(self.size, index * block_size + len(block))
+            yield index * block_size, block
+        self.scanned = self._end
+        self.eof = True
+
+    def _spool(self, output, data):
+        """把从解压后位置 output 开始的数据中尚未写入的部分按顺序追加到临时文件"""
+        with self._lock:
+            if self._spool_file is None or not output <= self._spooled < output + len(data):
+                return
+            self._spool_file.seek(self._spooled)
+            self._spool_file.write(data[self._spooled - output:])
+            self._spooled = output + len(data)
+
+    def assume_scanned(self, size):
+        """使用缓存的解压后大小，不再顺序扫描
+
+        检查点（或临时文件中的数据）在之后随机读取时按需记录。
+        """
+        self.size = size
+        self.scanned = self._end
+        self.eof = True
+
+    def _block(self, index):
+        """返回第 index 块，不在缓存中时从最近的检查点开始解压"""
+        with self._lock:
+            block = self._blocks.get(index)
+            if block is not None:
+                self._blocks.move_to_end(index)
+                return block
+            start = index * self.BLOCK_SIZE
+            if self._spool_file is not None and start < self._spooled:
+                self._spool_file.seek(start)
+                block = self._spool_file.read(self.BLOCK_SIZE)
+        if block is not None:
+            self._cache_block(index, block)
+            return block
+        point = self._point_before(start)
+        output, buffer = point[1], bytearray()
+        next_point = output + self.SEEK_INTERVAL
+        for data, position, decompressor in self._decompress(point):
+            # 使用缓存的行索引时没有顺序扫描过，检查点和临时文件在这里补上
+            self._spool(output, data)
+            if output + len(data) > start:
+                buffer += data[max(0, start - output):]
+            output += len(data)
+            if output >= next_point:
+                self._checkpoint(position, output, decompressor)
+                next_point = output + self.SEEK_INTERVAL
+            if len(buffer) >= self.BLOCK_SIZE:
+                break
+        block = bytes(buffer[:self.BLOCK_SIZE])
+        self._cache_block(index, block)
+        return block
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(self.size if self.eof else max(self.size, key.stop or 0))
+        if stop <= start:
+            return b''
+        block_size = self.BLOCK_SIZE
+        parts = []
+        for index in range(start // block_size, (stop - 1) // block_size + 1):
+            block = self._block(index)
+            base = index * block_size
+            parts.append(block[max(0, start - base):stop - base])
+        return b''.join(parts)
+
+    def find(self, sub, start, end):
+        i = self[start:end].find(sub)
+        return i if i == -1 else start + i
+
+    def rfind(self, sub, start, end):
+        i = self[start:end].rfind(sub)
+        return i if i == -1 else start + i
+
+    def memory_size(self):
+        """检查点和块缓存占用的内存字节数（估算，每个解压器副本约 64 KB）"""
+        return len(self._points) * 64 * 1024 + len(self._blocks) * self.BLOCK_SIZE
+
+    def trim(self):
+        """丢弃缓存的块，检查点和临时文件保留"""
+        with self._lock:
+            self._blocks.clear()
+
+    def close(self):
+        with self._lock:
+            self._blocks.clear()
+            if self._spool_file is not None:
+                self._spool_file.close()
+                self._spool_file = None
+                self._spooled = 0
+        self._points = self._points[:1]
+
+
+class CompressedDocument(Document):
+    """压缩文件中的文本文档
+
+    行偏移是相对解压后内容的字节偏移。解压在建立行索引时顺序进行，
+    第一屏解压出来后即可显示，之后按检查点随机读取可见窗口的文本。
+    """
+
+    # 只能顺序解压，无法在建立索引前直接按偏移读取
+    RANDOM_ACCESS = False
+    # 解压后大小的缓存文件，与行索引一起缓存
+    SIZE_CACHE = 'size.json'
+
+    def __init__(self, file_path, encoding=None):
+        self.file_path = file_path
+        self._stat = os.stat(file_path)
+        self._data = DecompressedData(file_path)
+        self.size = 0
+        self.cache = FileCache(file_path, self._stat)
+        if encoding is None:
+            encoding = self._cached_encoding()
+        self.encoding = encoding
+
+        self.data_start = bom_length(self._data[:4], encoding)
+        self._newline = '\n'.encode(encoding)
+        self.line_offsets = array('Q', [self.data_start])
+        self.soft_lines = array('Q')
+        self._indexed = self.data_start
+
+    @property
+    def complete(self):
+        return self._data.eof and self._indexed >= self.size
+
+    def load_progress(self):
+        """以压缩数据的读取进度表示加载进度"""
+        return self._data.scanned - self._data._start, self._data._end - self._data._start
+
+    def iter_index(self, chunk_size=None):
+        """边解压边建立行索引，每解压一块产出已索引的字节数"""
+        if self.complete:
+            # 已读取缓存的行索引，不必再解压
+            return
+        newline = self._newline
+        unit = len(newline)
+        limit = self.BLOCK_GRID
+        offsets = self.line_offsets
+        for base, block in self._data.scan(self._indexed):
+            i = block.find(newline, max(0, self._indexed - base))
+            while i != -1:
+                if (base + i - self.data_start) % unit:
+                    i = block.find(newline, i + 1)
+                    continue
+                if base + i - offsets[-1] > limit:
+                    self.split_long_line(base + i)
+                offsets.append(base + i + unit)
+                i = block.find(newline, i + unit)
+            self.size = self._data.size
+            self._indexed = base + len(block)
+            if self._indexed - offsets[-1] > limit:
+                self.split_long_line(self._indexed)
+            yield self._indexed
+        self.size = self._data.size
+
+    def load_cached_index(self):
+        """读取缓存的行索引和解压后的大小，不必重新解压整个文件"""
+        meta = self.cache.load_json(self.SIZE_CACHE)
+        size = meta.get('size') if isinstance(meta, dict) else None
+        if not isinstance(size, int) or not self._load_index(size):
+            return False
+        self._data.assume_scanned(size)
+        self.size = size
+        return True
+
+    def save_index(self):
+        if self.complete:
+            self.cache.save_json(self.SIZE_CACHE, {'size': self.size})
+            super().save_index()
+
+    def grow(self):
+        # 压缩文件无法只读取追加的部分，文件变化后需要重新打开
+        stat = os.stat(self.file_path)
+        if (stat.st_size, stat.st_mtime_ns) != (self._stat.st_size, self._stat.st_mtime_ns):
+            return -1
+        return 0
+
+    def trim(self):
+        self._data.trim()
+
+    def memory_size(self):
+        return super().memory_size() + self._data.memory_size()
+
+    def close(self):
+        self._data.close()
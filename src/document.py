@@ -0,0 +1,456 @@
+import codecs
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from src.cache import FileCache
+from src.encoding import bom_length, detect_encoding
+
+
+# 拆分过长的行时优先断开的位置：句末标点（连同后面的引号、括号）之后，其次是分句标点或空白之后
+_CLOSERS = re.escape('”’」』）》】)]"\'')
+_SENTENCE_BREAK = re.compile(rf'[。！？!?…]+[{_CLOSERS}]*\s*|\.[{_CLOSERS}]*\s+')
+_CLAUSE_BREAK = re.compile(rf'[，、；：,;:]+[{_CLOSERS}]*|\s+')
+
+
+def break_point(text, start=0):
+    """返回拆分 text 的字符位置：start 之后最后一个句末标点之后，其次是分句标点或空白之后，
+    都没有时返回 len(text)"""
+    for pattern in (_SENTENCE_BREAK, _CLAUSE_BREAK):
+        cut = 0
+        for match in pattern.finditer(text, start):
+            cut = match.end()
+        if cut:
+            return cut
+    return len(text)
+
+
+def _complete_chars(data, encoding):
+    """解码 data 中的完整字符，末尾被截断的多字节字符不输出"""
+    return codecs.getincrementaldecoder(encoding)(errors='surrogateescape').decode(data)
+
+
+def open_document(file_path):
+    """按扩展名打开文档：压缩文件边解压边建立索引，EPUB/HTML 按章节提取正文，
+    其余文件通过内存映射打开"""
+    from src.compressed import CompressedDocument, is_compressed
+    from src.epub import EpubDocument, HtmlDocument, is_markup
+
+    if is_compressed(file_path):
+        return CompressedDocument(file_path)
+    if is_markup(file_path):
+        if file_path.lower().endswith('.epub'):
+            return EpubDocument(file_path)
+        return HtmlDocument(file_path)
+    return Document(file_path)
+
+
+class Document:
+    """基于内存映射的只读文本文档
+
+    文件内容不会整体读入内存，而是通过 mmap 按需访问；
+    每行的起始字节偏移保存在紧凑的 array 中，视图只取可见窗口的文本进行解码。
+    """
+
+    # 每次扫描换行符的块大小
+    INDEX_CHUNK_SIZE = 4 * 1024 * 1024
+    # 检测编码时读取的字节数
+    SNIFF_SIZE = 64 * 1024
+    # 按偏移直接打开时，在偏移前后各索引的字节数
+    SLICE_BEFORE = 256 * 1024
+    SLICE_AFTER = 512 * 1024
+    # 可以在建立行索引之前直接按偏移读取（用于从阅读位置立即打开）
+    RANDOM_ACCESS = True
+    # 映射的是派生文件（如清理后的文本）时，原文件的缓存键
+    source_key = None
+    # 派生文件中各行的起始偏移和对应原文件行的起始偏移 (array, array)，用于换算阅读位置
+    source_lines = None
+    # 完整行索引的缓存文件
+    INDEX_CACHE = 'lines.idx'
+    # 软换行行号的缓存文件
+    BREAKS_CACHE = 'grid-breaks.idx'
+    # 超过这个字节数的行拆成多个显示块，限制单个文本块的排版开销
+    MAX_BLOCK_BYTES = 4096
+    # 拆分点所在网格的间距（相对 data_start），相邻拆分点的距离不超过 MAX_BLOCK_BYTES
+    BLOCK_GRID = MAX_BLOCK_BYTES // 2
+
+    def __init__(self, file_path, encoding=None):
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        try:
+            stat = os.fstat(self._file.fileno())
+            self.size = stat.st_size
+            if self.size:
+                self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # 空文件无法映射
+                self._data = b''
+        except Exception:
+            self._file.close()
+            raise
+
+        # 检测到的编码按文件缓存，再次打开时跳过检测
+        self.cache = FileCache(file_path, stat)
+        if encoding is None:
+            encoding = self._cached_encoding()
+        self.encoding = encoding
+
+        # 文本从 BOM 之后开始，换行符按编码的码元对齐
+        self.data_start = bom_length(self._data[:4], encoding)
+        self._newline = '\n'.encode(encoding)
+
+        # 每行起始字节偏移
+        self.line_offsets = array('Q', [self.data_start])
+        # 过长的行拆开后，不是从换行符之后开始的行号（升序）
+        self.soft_lines = array('Q')
+        self._indexed = self.data_start
+
+    def _cached_encoding(self):
+        """读取缓存的编码，没有缓存时检测并写入缓存"""
+        meta = self.cache.load_json('encoding.json')
+        if meta and meta.get('encoding'):
+            return meta['encoding']
+        encoding, _ = detect_encoding(self._data[:self.SNIFF_SIZE])
+        self.cache.save_json('encoding.json', {'encoding': encoding})
+        return encoding
+
+    @property
+    def complete(self):
+        """行索引是否已经建立完成"""
+        return self._indexed >= self.size
+
+    def table_of_contents(self):
+        """返回文件自带的目录 [(字节偏移, 标题)]，纯文本没有目录，返回 None"""
+        return None
+
+    def load_progress(self):
+        """返回加载进度 (已完成, 总量)"""
+        return self._indexed, self.size
+
+    def iter_index(self, chunk_size=None):
+        """分块扫描换行符建立行索引，每处理完一块产出已索引的字节数"""
+        newline = self._newline
+        unit = len(newline)
+        # 块边界与码元对齐，保证多字节换行符不会跨块
+        chunk_size = (chunk_size or self.INDEX_CHUNK_SIZE) // unit * unit
+        limit = self.BLOCK_GRID
+        find = self._data.find
+        offsets = self.line_offsets
+        pos = self._indexed
+
+        while pos < self.size:
+            end = min(pos + chunk_size, self.size)
+            i = find(newline, pos, end)
+            while i != -1:
+                if (i - self.data_start) % unit:
+                    # UTF-16/32 中跨码元的假匹配
+                    i = find(newline, i + 1, end)
+                    continue
+                if i - offsets[-1] > limit:
+                    self.split_long_line(i)
+                offsets.append(i + unit)
+                i = find(newline, i + unit, end)
+            if end - offsets[-1] > limit:
+                # 尚未结束的行也先拆出已读到的部分，没有换行符的文件可以立即显示
+                self.split_long_line(end)
+            pos = end
+            self._indexed = pos
+            yield pos
+
+    def split_long_line(self, end):
+        """把超过 MAX_BLOCK_BYTES 的最后一行在 end 之前拆成若干显示块
+
+        每个完全落在行内的网格区间 [g, g + BLOCK_GRID) 中取一个拆分点，
+        拆分点只由网格区间内的文本决定，与从哪里开始建立索引无关，
+        因此局部索引与完整索引的拆分点一致。拆分点记录在行索引中，
+        对应的行号记录在 soft_lines 中，get_text 在这些位置插入换行。
+        """
+        step = self.BLOCK_GRID
+        offsets = self.line_offsets
+        pos = offsets[-1]
+        soft = self.soft_lines and self.soft_lines[-1] == len(offsets) - 1
+        if not soft and end - pos <= self.MAX_BLOCK_BYTES:
+            return
+        grid = pos + (self.data_start - pos) % step
+        while grid + step < end:
+            pos = self._grid_break(pos, grid)
+            self.soft_lines.append(len(offsets))
+            offsets.append(pos)
+            grid += step
+
+    def _grid_break(self, pos, grid):
+        """返回网格区间 (grid, grid + BLOCK_GRID] 中的拆分点，在字符边界上并尽量在标点处断开
+
+        pos 是 grid 之前最近的已知字符边界（上一个拆分点或行首）。
+        """
+        end = grid + self.BLOCK_GRID
+        cut = 0
+        try:
+            # 增量解码不输出末尾被截断的字符；grid 落在字符中间时 head 不包括这个字符
+            text = _complete_chars(self._data[pos:end], self.encoding)
+            head = _complete_chars(self._data[pos:grid], self.encoding)
+            if len(text) > len(head):
+                cut = pos + len(text[:break_point(text, len(head))].encode(self.encoding, errors='surrogateescape'))
+        except UnicodeError:
+            pass
+        if not grid < cut <= end:
+            # 找不到字符边界（如大段无法解码的字节），在网格上截断
+            cut = end
+        return cut
+
+    def load_cached_index(self):
+        """读取缓存的完整行索引，成功时返回 True
+
+        只有建立索引前就知道文件大小的文档（可以按偏移直接读取）才能直接校验缓存，
+        其他文档需要同时缓存内容的大小（见 CompressedDocument）。
+        """
+        if not self.RANDOM_ACCESS:
+            return False
+        return self._load_index(self.size)
+
+    def _load_index(self, size):
+        """读取缓存的行索引并按内容大小 size 校验，成功时返回 True"""
+        raw = self.cache.load_bytes(self.INDEX_CACHE)
+        breaks = self.cache.load_bytes(self.BREAKS_CACHE)
+        if not raw or len(raw) % 8 or breaks is None or len(breaks) % 8:
+            return False
+        offsets = array('Q')
+        offsets.frombytes(raw)
+        soft_lines = array('Q')
+        soft_lines.frombytes(breaks)
+        if offsets[0] != self.data_start or offsets[-1] > size:
+            return False
+        if soft_lines and soft_lines[-1] >= len(offsets):
+            return False
+        self.line_offsets = offsets
+        self.soft_lines = soft_lines
+        self._indexed = size
+        return True
+
+    def save_index(self):
+        """把完整的行索引写入缓存"""
+        if self.complete:
+            self.cache.save_bytes(self.BREAKS_CACHE, self.soft_lines.tobytes())
+            self.cache.save_bytes(self.INDEX_CACHE, self.line_offsets.tobytes())
+
+    def grow(self):
+        """文件末尾追加了内容时重新映射文件，返回新增的字节数
+
+        只接受到最后一个完整字符为止的字节：新增部分用增量解码器解码，
+        末尾被截断的多字节字符留到下次追加后再读取。
+        文件变小或被替换为另一个文件时返回 -1，需要重新打开。
+        """
+        stat = os.fstat(self._file.fileno())
+        try:
+            replaced = not os.path.samestat(stat, os.stat(self.file_path))
+        except OSError:
+            replaced = True
+        if replaced or stat.st_size < self.size:
+            return -1
+        if stat.st_size == self.size:
+            return 0
+        data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        decoder.decode(data[max(self.size, self.data_start):stat.st_size])
+        pending = len(decoder.getstate()[0])
+        size = stat.st_size - pending
+        if size <= self.size:
+            data.close()
+            return 0
+
+        # 旧的映射可能仍被局部索引引用，不主动关闭，由垃圾回收释放
+        self._data = data
+        grown = size - self.size
+        self.size = size
+        self.cache = FileCache(self.file_path, stat)
+        return grown
+
+    def line_start_before(self, offset):
+        """返回 offset 所在行的起始字节偏移，最多向前查找 SLICE_BEFORE 字节"""
+        unit = len(self._newline)
+        offset = max(self.data_start, min(offset, self.size))
+        offset -= (offset - self.data_start) % unit
+        lower = max(self.data_start, offset - self.SLICE_BEFORE)
+        i = self._data.rfind(self._newline, lower, offset)
+        while i != -1 and (i - self.data_start) % unit:
+            i = self._data.rfind(self._newline, lower, i + unit - 1)
+        if i == -1:
+            return lower if lower == self.data_start else offset
+        return i + unit
+
+    def slice_around(self, offset):
+        """只索引 offset 附近的一段文本，用于在完整索引建立前立即显示
+
+        附近没有换行符、需要从行中间开始而编码无法判断字符边界时返回 None。
+        """
+        unit = len(self._newline)
+        start = self.line_start_before(offset - DocumentSlice.SLICE_BEFORE)
+        if start > self.data_start and self._data[start - unit:start] != self._newline:
+            start = self.char_start(start)
+            if start is None:
+                return None
+        return DocumentSlice(self, start, offset)
+
+    def char_start(self, offset):
+        """返回 offset 处或之后第一个字符的起始字节偏移（offset 已按码元对齐）
+
+        只有 UTF 编码可以从任意位置判断字符边界，其他多字节编码（如 GB18030、Big5）返回 None。
+        """
+        name = codecs.lookup(self.encoding).name
+        data = self._data
+        if name == 'utf-8':
+            # 跳过前一个字符剩余的后续字节
+            for _ in range(3):
+                if offset < self.size and 0x80 <= data[offset] < 0xc0:
+                    offset += 1
+            return offset
+        if name in ('utf-16-le', 'utf-16-be'):
+            # 跳过代理对的后一半
+            value = int.from_bytes(data[offset:offset + 2], 'little' if name.endswith('le') else 'big')
+            if 0xdc00 <= value < 0xe000:
+                offset += 2
+            return offset
+        if name in ('utf-32-le', 'utf-32-be'):
+            return offset
+        return None
+
+    def build_index(self):
+        """一次性建立完整的行索引"""
+        for _ in self.iter_index():
+            pass
+
+    def line_count(self):
+        """已知完整的行数"""
+        count = len(self.line_offsets)
+        if not self.complete or (self.size and self.line_offsets[-1] >= self.size):
+            # 最后一行尚未扫描完，或文件以换行结尾
+            count -= 1
+        return count
+
+    def offset_of_line(self, line):
+        """返回某一行的起始字节偏移"""
+        return self.line_offsets[line]
+
+    def line_at_offset(self, offset):
+        """返回包含某字节偏移的行号"""
+        line = bisect_right(self.line_offsets, offset) - 1
+        return max(0, min(line, self.line_count() - 1))
+
+    def to_source_offset(self, offset):
+        """把字节偏移换算为原文件中的偏移，阅读位置都按原文件保存"""
+        if self.source_lines is None:
+            return offset
+        starts, source_starts = self.source_lines
+        return self._translate(offset, starts, source_starts, None)
+
+    def from_source_offset(self, offset):
+        """把原文件中的字节偏移换算为本文档中的偏移
+
+        派生文件还没有生成到这个位置时返回当前大小。
+        """
+        if self.source_lines is None:
+            return offset
+        starts, source_starts = self.source_lines
+        if not self.complete and (not source_starts or offset >= source_starts[-1]):
+            return self.size
+        return self._translate(offset, source_starts, starts, self.size)
+
+    @staticmethod
+    def _translate(offset, starts, targets, end):
+        """按行换算偏移：找到 starts 中包含 offset 的行，行内按相同的字节数换算并限制在对应行内"""
+        count = min(len(starts), len(targets))
+        i = min(bisect_right(starts, offset), count) - 1
+        if i < 0:
+            return targets[0] if count else 0
+        upper = targets[i + 1] - 1 if i + 1 < len(targets) else end
+        delta = offset - starts[i]
+        if upper is not None:
+            delta = min(delta, max(0, upper - targets[i]))
+        return targets[i] + delta
+
+    def get_bytes(self, start, end):
+        """返回某字节区间的原始数据"""
+        return self._data[start:end]
+
+    def get_text(self, start_line, end_line):
+        """解码 [start_line, end_line) 行的文本，不含末尾换行，软换行处插入换行"""
+        if end_line <= start_line:
+            return ""
+        soft_lines = self.soft_lines
+        if soft_lines:
+            first = bisect_right(soft_lines, start_line)
+            last = bisect_left(soft_lines, end_line)
+            if first < last:
+                bounds = [start_line, *soft_lines[first:last], end_line]
+                return '\n'.join(self.get_text(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1))
+        start = self.line_offsets[start_line]
+        if end_line < len(self.line_offsets):
+            end = self.line_offsets[end_line]
+        else:
+            end = self.size
+        text = self._data[start:end].decode(self.encoding, errors='replace')
+        text = text.replace('\r\n', '\n')
+        if text.endswith('\n'):
+            text = text[:-1]
+        return text
+
+    def trim(self):
+        """释放可以重新读取的内容（内存映射已读入的页面），行索引保留"""
+        if isinstance(self._data, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+            try:
+                self._data.madvise(mmap.MADV_DONTNEED)
+            except OSError:
+                pass
+
+    def memory_size(self):
+        """行索引占用的内存字节数（不包括内存映射的文件内容）"""
+        return (self.line_offsets.itemsize * len(self.line_offsets)
+                + self.soft_lines.itemsize * len(self.soft_lines))
+
+    def close(self):
+        """释放内存映射和文件句柄"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b''
+        self._file.close()
+
+
+class DocumentSlice(Document):
+    """文档中以行边界（或过长行中的字符边界）对齐的一段
+
+    与所属文档共享内存映射，行偏移仍是相对整个文件的字节偏移，
+    软换行与完整索引落在同一网格上，因此可以在完整索引建立后无缝切换回完整文档。
+    """
+
+    def __init__(self, document, start, offset):
+        self.document = document
+        self.file_path = document.file_path
+        self.encoding = document.encoding
+        self.cache = document.cache
+        self.data_start = document.data_start
+        self._data = document._data
+        self._newline = document._newline
+
+        unit = len(self._newline)
+        self.size = min(document.size, max(offset, start) + self.SLICE_AFTER)
+        self.line_offsets = array('Q', [start])
+        self.soft_lines = array('Q')
+        if start > self.data_start and self._data[start - unit:start] != self._newline:
+            # 从过长的行中间开始，第一行按软换行处理，之后的网格拆分点与完整索引相同
+            self.soft_lines.append(0)
+        self._indexed = start
+        self.build_index()
+
+        # 丢弃被截断的最后一行
+        if self.size < document.size and len(self.line_offsets) > 1:
+            self.size = self.line_offsets[-1]
+
+    def trim(self):
+        # 内存映射归所属文档管理
+        pass
+
+    def close(self):
+        # 内存映射归所属文档管理
+        pass
@@ -0,0 +1,100 @@
+import codecs
+
+# 按优先级排列的 BOM，UTF-32 必须排在 UTF-16 之前（前两个字节相同）
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+# 无 BOM 时依次尝试的中文编码
+CJK_CANDIDATES = ('gb18030', 'big5')
+
+# 简繁体中文里最常见的字，用于区分 GB18030 和 Big5 的解码结果
+COMMON_CHARS = frozenset(
+    "的一是不了在人有我他这這个個们們中来來上大为為和国國地到以说說时時要就出会會可也你对對生能而子那得于於着著"
+    "下自之年过過发發后後作里裡用道行所然家种種事成方多经經么麼去法学學如都同现現当當没沒动動面起看定天分还還进進"
+    "好小部其些主样樣理心她本前开開但因只从從想实實日军軍者意无無力它与與长長把机機十民第公此已工使情明性知全三又"
+    "关關点點正业業外将將两兩高间間由问問很最重并並物手应應战戰向头頭文体體政美相见見被利什二等产產或新己制身果加"
+    "西斯月话話合回特代内內信表化老给給世位次度门門任常先海通教儿兒原东東声聲提立及比员員解水名真论論处處走义義各"
+    "入几幾口认認条條平系氣气题題活尔爾更别別打女变變四神总總何电電数數安少报報才结結反受目太量再感建务務做接必场場"
+    "件计計管期市直德资資命山金指克许許统統区區保至队隊形社便空决決治展马馬科司五基眼书書非则則听聽白却卻界达達光放"
+    "强強即像难難且权權思王象完设設式色路记記南品住告类類求据據程北边邊死张張该該交规規万萬取拉格望觉覺术術领領共"
+    "确確传傳师師观觀清今切院让讓识識候带帶导導争爭运運笑飞飛风風步改收根干幹议議九群"
+)
+
+# 猜测编码时允许的替换字符比例（容忍少量混入的非法字节）
+MAX_ERROR_RATIO = 0.01
+
+
+def bom_length(data, encoding):
+    """返回数据开头与指定编码匹配的 BOM 长度"""
+    for bom, name in BOMS:
+        if name == codecs.lookup(encoding).name and data.startswith(bom):
+            return len(bom)
+    return 0
+
+
+def _decode_prefix(data, encoding):
+    """以增量方式解码一段前缀，末尾被截断的多字节字符不计为错误"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    return decoder.decode(data, final=False)
+
+
+def _utf16_without_bom(data):
+    """根据换行符码元的字节序判断是否为不带 BOM 的 UTF-16"""
+    sample = data[:4096]
+    units = [sample[i:i + 2] for i in range(0, len(sample) - 1, 2)]
+    little = units.count(b'\n\x00')
+    big = units.count(b'\x00\n')
+    # 单字节编码中换行符不会与零字节相邻
+    if little and not big:
+        return 'utf-16-le'
+    if big and not little:
+        return 'utf-16-be'
+    return None
+
+
+def _error_ratio(text):
+    """解码结果中替换字符占非 ASCII 字符的比例"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 0x7F)
+    if not non_ascii:
+        return 0.0
+    return text.count('\ufffd') / non_ascii
+
+
+def _score(text):
+    """常用汉字在非 ASCII 字符中所占的比例"""
+    non_ascii = [ch for ch in text if ord(ch) > 0x7F]
+    if not non_ascii:
+        return 0.0
+    common = sum(1 for ch in non_ascii if ch in COMMON_CHARS)
+    return (common - non_ascii.count('\ufffd') * 10) / len(non_ascii)
+
+
+def detect_encoding(data):
+    """根据文件开头的一段字节检测编码
+
+    依次检查 BOM、UTF-16 的零字节分布、UTF-8 合法性，
+    最后用常用字频率在 GB18030 和 Big5 之间选择。
+    返回 (编码名, BOM 长度)。
+    """
+    for bom, name in BOMS:
+        if data.startswith(bom):
+            return name, len(bom)
+
+    utf16 = _utf16_without_bom(data)
+    if utf16:
+        return utf16, 0
+
+    if _error_ratio(_decode_prefix(data, 'utf-8')) <= MAX_ERROR_RATIO:
+        return 'utf-8', 0
+
+    best, best_score = CJK_CANDIDATES[0], None
+    for encoding in CJK_CANDIDATES:
+        score = _score(_decode_prefix(data, encoding))
+        if best_score is None or score > best_score:
+            best, best_score = encoding, score
+    return best, 0
@@ -0,0 +1,421 @@
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from html.parser import HTMLParser
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from src.cache import FileCache
+from src.document import Document
+from src.encoding import detect_encoding
+
+# 按扩展名判断的格式
+EPUB_SUFFIXES = ('.epub',)
+HTML_SUFFIXES = ('.html', '.htm', '.xhtml')
+
+# HTML/XML 中声明的编码
+CHARSET_PATTERN = re.compile(rb'''(?:charset|encoding)\s*=\s*["']?([\w.:-]+)''', re.IGNORECASE)
+# 普通文本中连续的空白（不包括全角空格，保留段首缩进）
+SPACE_PATTERN = re.compile(r'[ \t\r\n\f]+')
+
+
+def is_markup(file_path):
+    return file_path.lower().endswith(EPUB_SUFFIXES + HTML_SUFFIXES)
+
+
+def decode_html(raw):
+    """按 BOM、声明的编码或检测结果解码 HTML"""
+    if raw.startswith(b'\xef\xbb\xbf'):
+        return raw[3:].decode('utf-8', errors='replace')
+    if raw.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return raw.decode('utf-16', errors='replace')
+    match = CHARSET_PATTERN.search(raw[:1024])
+    if match:
+        try:
+            return raw.decode(match.group(1).decode('ascii'), errors='replace')
+        except LookupError:
+            pass
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        encoding, bom = detect_encoding(raw[:Document.SNIFF_SIZE])
+        return raw[bom:].decode(encoding, errors='replace')
+
+
+class _TextExtractor(HTMLParser):
+    """提取 HTML 正文：块级元素之间换行，忽略 head、script 和 style"""
+
+    BLOCK_TAGS = {
+        'p', 'div', 'br', 'hr', 'li', 'tr', 'dt', 'dd', 'pre', 'blockquote',
+        'section', 'article', 'header', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    }
+    SKIP_TAGS = {'head', 'script', 'style'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+        self._pre = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+            if tag == 'pre':
+                self._pre += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+            if tag == 'pre':
+                self._pre = max(0, self._pre - 1)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self.parts.append(data if self._pre else SPACE_PATTERN.sub(' ', data))
+
+
+def html_to_text(raw):
+    """把 HTML 转换为纯文本，每段一行，以换行结尾（没有正文时返回空串）"""
+    parser = _TextExtractor()
+    parser.feed(decode_html(raw))
+    parser.close()
+    lines = (line.strip(' \t\r\f') for line in ''.join(parser.parts).split('\n'))
+    text = '\n'.join(line for line in lines if line)
+    return text + '\n' if text else ''
+
+
+class _LinkCollector(HTMLParser):
+    """收集 EPUB3 导航文档中第一个（或 toc 类型的）nav 中的链接"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._nav_depth = 0
+        self._done = False
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'nav' and not self._done:
+            if self._nav_depth or 'toc' in attrs.get('epub:type', 'toc'):
+                self._nav_depth += 1
+        elif tag == 'a' and self._nav_depth and attrs.get('href'):
+            self._href, self._text = attrs['href'], []
+
+    def handle_endtag(self, tag):
+        if tag == 'nav' and self._nav_depth:
+            self._nav_depth -= 1
+            self._done = not self._nav_depth
+        elif tag == 'a' and self._href is not None:
+            self.links.append((self._href, SPACE_PATTERN.sub(' ', ''.join(self._text)).strip()))
+            self._href = None
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+
+class ChapterData:
+    """按章节懒加载的文本，提供与内存映射相同的按字节区间读取接口
+
+    所有章节提取为 UTF-8 纯文本后首尾相接，构成一个虚拟的字节空间；
+    章节的起始位置在顺序扫描时确定，之后只在读取到某一章时才提取这一章，
+    提取结果保存在按字节数限制的 LRU 缓存中。
+    """
+
+    # 缓存的章节文本上限（字节）
+    CACHE_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, loaders):
+        # 每章一个函数，返回该章的原始 HTML
+        self._loaders = loaders
+        # 已扫描章节的起始位置
+        self.bases = array('Q')
+        self.size = 0
+        self._texts = OrderedDict()
+        self._cached = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def chapter(self, index):
+        """返回第 index 章的 UTF-8 文本"""
+        with self._lock:
+            text = self._texts.get(index)
+            if text is not None:
+                self._texts.move_to_end(index)
+                return text
+        text = html_to_text(self._loaders[index]()).encode('utf-8')
+        with self._lock:
+            if index in self._texts:
+                return self._texts[index]
+            self._texts[index] = text
+            self._cached += len(text)
+            while self._cached > self.CACHE_BYTES and len(self._texts) > 1:
+                _, evicted = self._texts.popitem(last=False)
+                self._cached -= len(evicted)
+            return text
+
+    def scan(self, start=0):
+        """从第 start 章开始依次提取，记录每章的起始位置，产出 (起始位置, 文本)"""
+        for index in range(start, len(self._loaders)):
+            text = self.chapter(index)
+            base = self.size
+            if index == len(self.bases):
+                self.bases.append(base)
+                self.size += len(text)
+            yield base, text
+
+    def restore(self, bases, size):
+        """使用缓存的章节起始位置和总大小，不再逐章提取"""
+        self.bases = bases
+        self.size = size
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(self.size)
+        parts = []
+        index = bisect_right(self.bases, start) - 1
+        while start < stop and 0 <= index < len(self.bases):
+            base = self.bases[index]
+            text = self.chapter(index)
+            parts.append(text[start - base:stop - base])
+            start = base + len(text)
+            index += 1
+        return b''.join(parts)
+
+    def find(self, sub, start, end):
+        i = self[start:end].find(sub)
+        return i if i == -1 else start + i
+
+    def rfind(self, sub, start, end):
+        i = self[start:end].rfind(sub)
+        return i if i == -1 else start + i
+
+    def memory_size(self):
+        return self.bases.itemsize * len(self.bases) + self._cached
+
+    def close(self):
+        # 提取的章节文本都可以重新生成，关闭和释放内存相同
+        with self._lock:
+            self._texts.clear()
+            self._cached = 0
+
+    trim = close
+
+
+class ChapterDocument(Document):
+    """由若干 HTML 章节组成的文档
+
+    行偏移是相对所有章节纯文本（UTF-8）首尾相接后的字节偏移。
+    后台建立行索引时逐章提取并记录行偏移，显示时只提取可见窗口附近的章节。
+    """
+
+    # 章节位置在扫描前未知，无法直接按偏移读取
+    RANDOM_ACCESS = False
+    # 每章起始位置的缓存文件，最后一项是所有章节文本的总大小
+    BASES_CACHE = 'chapters.idx'
+
+    def __init__(self, file_path, loaders, toc=None):
+        self.file_path = file_path
+        self._stat = os.stat(file_path)
+        self._data = ChapterData(loaders)
+        # 目录：[(章节序号, 标题)]
+        self._toc = toc or []
+        self.size = 0
+        self.cache = FileCache(file_path, self._stat)
+        self.encoding = 'utf-8'
+        self.data_start = 0
+        self._newline = b'\n'
+        self.line_offsets = array('Q', [0])
+        self.soft_lines = array('Q')
+        self._indexed = 0
+
+    @property
+    def complete(self):
+        return len(self._data.bases) >= len(self._data)
+
+    def load_progress(self):
+        return len(self._data.bases), len(self._data)
+
+    def iter_index(self, chunk_size=None):
+        """逐章提取文本并建立行索引，每完成一章产出已索引的字节数"""
+        limit = self.BLOCK_GRID
+        offsets = self.line_offsets
+        for base, text in self._data.scan(len(self._data.bases)):
+            i = text.find(b'\n')
+            while i != -1:
+                if base + i - offsets[-1] > limit:
+                    self.split_long_line(base + i)
+                offsets.append(base + i + 1)
+                i = text.find(b'\n', i + 1)
+            self.size = self._indexed = self._data.size
+            if self.size - offsets[-1] > limit:
+                self.split_long_line(self.size)
+            yield self._indexed
+
+    def load_cached_index(self):
+        """读取缓存的章节位置和行索引，不必重新提取所有章节"""
+        raw = self.cache.load_bytes(self.BASES_CACHE)
+        if not raw or len(raw) % 8:
+            return False
+        bases = array('Q')
+        bases.frombytes(raw)
+        size = bases.pop()
+        if len(bases) != len(self._data) or list(bases) != sorted(bases) or (bases and bases[-1] > size):
+            return False
+        if not self._load_index(size):
+            return False
+        self._data.restore(bases, size)
+        self.size = size
+        return True
+
+    def save_index(self):
+        if self.complete:
+            bases = array('Q', self._data.bases)
+            bases.append(self.size)
+            self.cache.save_bytes(self.BASES_CACHE, bases.tobytes())
+            super().save_index()
+
+    def table_of_contents(self):
+        """返回目录 [(字节偏移, 标题)]，没有目录时返回 None"""
+        if not self._toc or not self.complete:
+            return None
+        bases = self._data.bases
+        return [(bases[index], title) for index, title in self._toc]
+
+    def grow(self):
+        # 文件变化后需要重新打开
+        stat = os.stat(self.file_path)
+        if (stat.st_size, stat.st_mtime_ns) != (self._stat.st_size, self._stat.st_mtime_ns):
+            return -1
+        return 0
+
+    def trim(self):
+        self._data.trim()
+
+    def memory_size(self):
+        return super().memory_size() + self._data.memory_size()
+
+    def close(self):
+        self._data.close()
+
+
+class HtmlDocument(ChapterDocument):
+    """单个 HTML 文件，整个文件作为一章"""
+
+    def __init__(self, file_path):
+        def load():
+            with open(file_path, 'rb') as file:
+                return file.read()
+        super().__init__(file_path, [load])
+
+
+class EpubDocument(ChapterDocument):
+    """EPUB 电子书：打开时只解析 OPF 的阅读顺序和目录，章节在用到时才解压提取"""
+
+    def __init__(self, file_path):
+        self._archive = zipfile.ZipFile(file_path)
+        self._archive_lock = threading.Lock()
+        try:
+            spine, toc = self._parse_package()
+        except Exception:
+            self._archive.close()
+            raise
+        loaders = [lambda name=name: self._read(name) for name in spine]
+        super().__init__(file_path, loaders, toc)
+
+    def _read(self, name):
+        with self._archive_lock:
+            return self._archive.read(name)
+
+    def _parse_package(self):
+        """返回阅读顺序中各章的路径和目录 [(章节序号, 标题)]"""
+        container = ElementTree.fromstring(self._archive.read('META-INF/container.xml'))
+        rootfile = next(element for element in container.iter() if element.tag.endswith('rootfile'))
+        opf_path = rootfile.get('full-path')
+        opf = ElementTree.fromstring(self._archive.read(opf_path))
+        opf_dir = posixpath.dirname(opf_path)
+
+        manifest = {}
+        nav_path = None
+        for item in opf.iter():
+            if item.tag.endswith('}item') or item.tag == 'item':
+                path = self._resolve(opf_dir, item.get('href', ''))
+                manifest[item.get('id')] = (path, item.get('media-type', ''))
+                if 'nav' in (item.get('properties') or '').split():
+                    nav_path = path
+
+        spine, ncx_path = [], None
+        for element in opf.iter():
+            if element.tag.endswith('}spine') or element.tag == 'spine':
+                toc_id = element.get('toc')
+                if toc_id in manifest:
+                    ncx_path = manifest[toc_id][0]
+            elif element.tag.endswith('}itemref') or element.tag == 'itemref':
+                item = manifest.get(element.get('idref'))
+                if item is not None and 'html' in item[1]:
+                    spine.append(item[0])
+        if not spine:
+            raise ValueError("EPUB 中没有正文")
+
+        if nav_path is not None:
+            links = self._nav_links(nav_path)
+        elif ncx_path is not None:
+            links = self._ncx_links(ncx_path)
+        else:
+            links = []
+        chapters = {path: index for index, path in enumerate(spine)}
+        toc = []
+        for path, title in links:
+            index = chapters.get(path)
+            if index is not None and title:
+                toc.append((index, title))
+        return spine, toc
+
+    @staticmethod
+    def _resolve(base_dir, href):
+        """把相对链接解析为压缩包内的路径（忽略 # 之后的锚点）"""
+        href = unquote(href.split('#', 1)[0])
+        return posixpath.normpath(posixpath.join(base_dir, href))
+
+    def _nav_links(self, nav_path):
+        """EPUB3 导航文档中的目录"""
+        parser = _LinkCollector()
+        parser.feed(decode_html(self._archive.read(nav_path)))
+        base_dir = posixpath.dirname(nav_path)
+        return [(self._resolve(base_dir, href), title) for href, title in parser.links]
+
+    def _ncx_links(self, ncx_path):
+        """EPUB2 NCX 中的目录（按文档顺序展开嵌套的条目）"""
+        ncx = ElementTree.fromstring(self._archive.read(ncx_path))
+        base_dir = posixpath.dirname(ncx_path)
+        links = []
+        for point in ncx.iter():
+            if not point.tag.endswith('navPoint'):
+                continue
+            title, src = '', None
+            for child in point:
+                if child.tag.endswith('navLabel'):
+                    title = ''.join(child.itertext()).strip()
+                elif child.tag.endswith('content'):
+                    src = child.get('src')
+            if src:
+                links.append((self._resolve(base_dir, src), title))
+        return links
+
+    def close(self):
+        super().close()
+        with self._archive_lock:
+            self._archive.close()
@@ -0,0 +1,112 @@
+import time
+from functools import partial
+
+from PySide6.QtCore import Qt, QObject, Signal
+
+
+class KeyboardBackend:
+    """基于 keyboard 模块的全局快捷键，回调在 keyboard 的钩子线程中执行"""
+
+    def __init__(self):
+        import keyboard
+        self._keyboard = keyboard
+
+    def register(self, combo, callback):
+        self._keyboard.add_hotkey(combo, callback)
+
+    def unregister_all(self):
+        self._keyboard.unhook_all_hotkeys()
+
+    def close(self):
+        self._keyboard.unhook_all()
+
+
+class FakeBackend:
+    """模拟的按键来源，用于测试：trigger() 可以在任意线程中调用，模拟钩子线程"""
+
+    def __init__(self):
+        self.hotkeys = {}
+
+    def register(self, combo, callback):
+        self.hotkeys[combo] = callback
+
+    def unregister_all(self):
+        self.hotkeys = {}
+
+    def close(self):
+        self.hotkeys = {}
+
+    def trigger(self, combo):
+        """模拟按下快捷键，返回是否有对应的绑定"""
+        callback = self.hotkeys.get(combo)
+        if callback is None:
+            return False
+        callback()
+        return True
+
+
+class HotkeyDispatcher(QObject):
+    """把全局快捷键转发到界面线程执行
+
+    钩子线程中的回调只记录时间戳并发出信号，动作通过队列连接在界面线程中执行，
+    执行完成后发出 handled，附带从钩子回调到动作完成的耗时（秒）。
+    """
+
+    ACTIONS = ("boss", "page_up", "page_down")
+    DEFAULT_BINDINGS = {
+        "boss": "ctrl+alt+h",
+        "page_up": "ctrl+alt+up",
+        "page_down": "ctrl+alt+down",
+    }
+
+    # 钩子线程发出：动作名称、按键时间
+    _triggered = Signal(str, float)
+    # 界面线程发出：动作名称、延迟（秒）
+    handled = Signal(str, float)
+
+    def __init__(self, backend, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.bindings = {}
+        self.latency = {}
+        self._handlers = {}
+        self._triggered.connect(self._dispatch, Qt.ConnectionType.QueuedConnection)
+
+    def bind(self, action, handler):
+        """设置动作在界面线程中的处理函数"""
+        self._handlers[action] = handler
+
+    def register(self, bindings):
+        """按 {动作: 组合键} 重新注册全部快捷键，组合键为空的动作不注册
+
+        返回注册失败的 [(动作, 组合键, 异常)]。
+        """
+        self.backend.unregister_all()
+        self.bindings = {}
+        failed = []
+        for action, combo in bindings.items():
+            if not combo:
+                continue
+            try:
+                self.backend.register(combo, partial(self._on_hook, action))
+                self.bindings[action] = combo
+            except Exception as e:
+                failed.append((action, combo, e))
+        return failed
+
+    def close(self):
+        self.backend.close()
+        self.bindings = {}
+
+    def _on_hook(self, action):
+        # 在钩子线程中执行，只做最少的工作，不阻塞后续按键
+        self._triggered.emit(action, time.perf_counter())
+
+    def _dispatch(self, action, pressed):
+        handler = self._handlers.get(action)
+        if handler is None:
+            return
+        handler()
+        latency = time.perf_counter() - pressed
+        self.latency[action] = latency
+        self.handled.emit(action, latency)
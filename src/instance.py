@@ -0,0 +1,155 @@
+import getpass
+import json
+import os
+import socket
+import sys
+import time
+
+
+def server_name():
+    """本地套接字的名称，每个用户一个"""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = ""
+    return f"StealthReader-{user}"
+
+
+def server_address():
+    """QLocalServer 监听的地址：Windows 上是命名管道的名称，其他系统上是套接字文件的路径
+
+    套接字文件放在只有当前用户可以访问的目录（XDG_RUNTIME_DIR，没有时为缓存目录）中，
+    其他用户无法抢先创建同名的套接字来接收转发的文件路径。
+    """
+    if sys.platform == 'win32':
+        return server_name()
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory or not os.path.isdir(directory):
+        from src.cache import cache_root
+        directory = cache_root()
+    return os.path.join(directory, server_name())
+
+
+def _owned_by_user(path):
+    """套接字文件是否属于当前用户"""
+    try:
+        return os.stat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def forward_to_running(file_path=None, offset=None, timeout=0.2):
+    """把要打开的文件交给已经运行的实例，返回是否成功（没有运行的实例时返回 False）
+
+    file_path 为空时只让已有实例显示窗口。只使用标准库连接，不必先加载 Qt，
+    因此转发后可以在几十毫秒内退出。
+    """
+    message = (json.dumps({"path": file_path, "offset": offset}, ensure_ascii=False) + "\n").encode("utf-8")
+    deadline = time.perf_counter() + timeout
+    if sys.platform == 'win32':
+        while True:
+            try:
+                with open(r"\\.\pipe" + "\\" + server_address(), "wb", buffering=0) as pipe:
+                    pipe.write(message)
+                return True
+            except FileNotFoundError:
+                return False
+            except OSError:
+                # 管道的所有实例都在忙，稍后重试
+                if time.perf_counter() >= deadline:
+                    return False
+                time.sleep(0.01)
+
+    address = server_address()
+    if not _owned_by_user(address):
+        return False
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(address)
+        client.sendall(message)
+        return True
+    except OSError:
+        # 没有套接字文件，或者是上次异常退出后残留的文件
+        return False
+    finally:
+        client.close()
+
+
+class InstanceServer:
+    """接收之后启动时转发过来的文件，每个连接发送一行 JSON：{"path": ..., "offset": ...}
+
+    on_open(文件路径, 字节偏移) 在界面线程中调用，路径为空表示只显示窗口，
+    偏移为空表示从阅读历史中的位置开始。
+    """
+
+    def __init__(self, on_open, parent=None):
+        from PySide6.QtNetwork import QLocalServer
+
+        self._on_open = on_open
+        self._server = QLocalServer(parent)
+        if sys.platform == 'win32':
+            self._server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        # 其他系统上套接字文件已经在只有当前用户可以访问的目录中。设置访问选项时 Qt 会在
+        # 临时目录中创建套接字再改名覆盖目标文件，地址已被占用时 listen() 也会成功
+        self._server.newConnection.connect(self._on_new_connection)
+        self._buffers = {}
+
+    def listen(self):
+        """开始监听，返回是否成功（失败原因见 error_string()）
+
+        地址已被占用时不删除：可能是同时启动的另一个实例刚刚开始监听，
+        调用方应先尝试把文件转发给它，转发失败后再调用 listen_replacing_stale()。
+        """
+        address = server_address()
+        if sys.platform != 'win32':
+            os.makedirs(os.path.dirname(address), mode=0o700, exist_ok=True)
+        return self._server.listen(address)
+
+    def listen_replacing_stale(self):
+        """删除上次异常退出后残留的套接字文件，然后重新监听（确认无法连接之后调用）"""
+        from PySide6.QtNetwork import QLocalServer
+
+        QLocalServer.removeServer(server_address())
+        return self._server.listen(server_address())
+
+    def error_string(self):
+        return self._server.errorString()
+
+    def close(self):
+        self._server.close()
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            connection = self._server.nextPendingConnection()
+            self._buffers[connection] = b""
+            connection.readyRead.connect(lambda connection=connection: self._on_ready_read(connection))
+            connection.disconnected.connect(lambda connection=connection: self._on_disconnected(connection))
+            if connection.bytesAvailable():
+                self._on_ready_read(connection)
+
+    def _on_ready_read(self, connection):
+        if connection not in self._buffers:
+            return
+        self._buffers[connection] += bytes(connection.readAll())
+        if b"\n" in self._buffers[connection]:
+            line = self._buffers.pop(connection).split(b"\n", 1)[0]
+            connection.disconnectFromServer()
+            self._handle(line)
+
+    def _on_disconnected(self, connection):
+        self._on_ready_read(connection)
+        self._buffers.pop(connection, None)
+        connection.deleteLater()
+
+    def _handle(self, line):
+        try:
+            request = json.loads(line.decode("utf-8"))
+            path, offset = request.get("path"), request.get("offset")
+        except (ValueError, AttributeError):
+            return
+        if path is not None and not isinstance(path, str):
+            return
+        if offset is not None and not isinstance(offset, int):
+            offset = None
+        self._on_open(path, offset)
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+from src.cache import file_key
+
+
+class LibraryEntry:
+    """缓存中的一个文档及其派生数据"""
+
+    def __init__(self, document, chapters, search_index):
+        self.document = document
+        self.chapters = chapters
+        self.search_index = search_index
+        self.size = document.memory_size()
+        if search_index is not None:
+            self.size += search_index.memory_size()
+        # 每个章节约为偏移、标题和元组本身
+        self.size += len(chapters) * 128
+
+
+class DocumentLibrary:
+    """最近打开的文档的 LRU 缓存，按占用的内存字节数限制大小
+
+    只缓存已经建立完整索引、当前没有显示的文档；重新打开时直接取出，
+    不必重新读取文件、检测编码和建立索引。文件在磁盘上变化后缓存自动失效。
+    """
+
+    # 缓存占用的内存上限（字节），不包括内存映射的文件内容
+    CAPACITY = 256 * 1024 * 1024
+    # 最多缓存的文档数（每个文档占用一个文件句柄）
+    MAX_DOCUMENTS = 8
+
+    def __init__(self, capacity=None, max_documents=None):
+        self.capacity = capacity or self.CAPACITY
+        self.max_documents = max_documents or self.MAX_DOCUMENTS
+        self._entries = OrderedDict()
+        self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, file_path):
+        return file_path in self._entries
+
+    def put(self, document, chapters, search_index):
+        """缓存文档，返回因超出容量而被移除的文件路径"""
+        self._remove(document.file_path)
+        entry = LibraryEntry(document, chapters, search_index)
+        if entry.size > self.capacity:
+            # 单个文档就超过上限，不缓存
+            document.close()
+            return [document.file_path]
+        self._entries[document.file_path] = entry
+        self.size += entry.size
+        evicted = []
+        while self.size > self.capacity or len(self._entries) > self.max_documents:
+            file_path = next(iter(self._entries))
+            self._remove(file_path)
+            evicted.append(file_path)
+        return evicted
+
+    def take(self, file_path):
+        """取出缓存的文档，没有缓存或文件已经变化时返回 None
+
+        取出的文档归调用者所有，不再由缓存关闭。
+        """
+        entry = self._entries.pop(file_path, None)
+        if entry is None:
+            return None
+        self.size -= entry.size
+        try:
+            document = entry.document
+            valid = file_key(file_path) == (document.source_key or document.cache.key)
+        except OSError:
+            valid = False
+        if not valid:
+            entry.document.close()
+            return None
+        return entry
+
+    def trim(self):
+        """释放缓存文档中可以重新读取的内容，索引保留"""
+        for entry in self._entries.values():
+            entry.document.trim()
+
+    def clear(self):
+        """关闭并移除所有缓存的文档，返回被移除的文件路径"""
+        file_paths = list(self._entries)
+        for file_path in file_paths:
+            self._remove(file_path)
+        return file_paths
+
+    def _remove(self, file_path):
+        entry = self._entries.pop(file_path, None)
+        if entry is not None:
+            self.size -= entry.size
+            entry.document.close()
@@ -0,0 +1,71 @@
+from PySide6.QtCore import QThread, Signal
+
+from src.chapters import load_chapters
+from src.search import load_search_index
+
+
+class FileLoader(QThread):
+    """在后台线程中为文档建立行索引
+
+    索引到足够显示第一屏的行数时发出 first_screen_ready，
+    之后持续发出 progress，全部完成后发出 finished_loading，
+    随后读取或扫描章节索引并发出 chapters_ready，
+    最后读取或建立搜索索引并发出 search_ready。
+    读取或解码出错（如压缩数据损坏）时发出 failed 并结束。
+    调用 requestInterruption() 可以在下一个数据块处取消。
+    """
+
+    first_screen_ready = Signal(object)
+    progress = Signal(object, int, int)
+    finished_loading = Signal(object)
+    chapters_ready = Signal(object, object)
+    search_ready = Signal(object, object)
+    failed = Signal(object, str)
+
+    # 每次扫描的块大小，较小的块可以更快显示第一屏并及时响应取消
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, document, first_screen_lines, parent=None, first_screen_offset=0):
+        super().__init__(parent)
+        self.document = document
+        self.first_screen_lines = first_screen_lines
+        # 第一屏从原文件中的这个字节偏移开始（只能顺序加载的文档需要索引到这里才能显示）
+        self.first_screen_offset = first_screen_offset
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.failed.emit(self.document, str(e))
+
+    def _run(self):
+        document = self.document
+        shown = False
+        # 预处理过或以前完整打开过的文件直接读取缓存的行索引
+        scanned = not document.complete and not document.load_cached_index()
+
+        if document.complete:
+            shown = True
+            self.first_screen_ready.emit(document)
+
+        for indexed in document.iter_index(self.CHUNK_SIZE):
+            if self.isInterruptionRequested():
+                return
+            if not shown:
+                first_line = document.line_at_offset(document.from_source_offset(self.first_screen_offset))
+                if document.complete or document.line_count() - first_line >= self.first_screen_lines:
+                    shown = True
+                    self.first_screen_ready.emit(document)
+            self.progress.emit(document, *document.load_progress())
+
+        if scanned:
+            document.save_index()
+        self.finished_loading.emit(document)
+
+        chapters = load_chapters(document, self.isInterruptionRequested)
+        if chapters is not None:
+            self.chapters_ready.emit(document, chapters)
+
+        index = load_search_index(document, self.isInterruptionRequested)
+        if index is not None:
+            self.search_ready.emit(document, index)
@@ -1,17 +1,57 @@
-from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, QSystemTrayIcon, QMenu, 
-                             QPushButton, QMessageBox, QFileDialog)
-from PySide6.QtCore import Qt, QSettings
-from PySide6.QtGui import QCursor, QIcon, QColor
-import keyboard
+from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QSystemTrayIcon, QMenu, 
+                             QPushButton, QMessageBox, QFileDialog, QFrame)
+from PySide6.QtCore import Qt, QSettings, QTimer, QFileSystemWatcher
+from PySide6.QtGui import QIcon, QColor, QPixmapCache
+import json
+import os
+import sys
+import time
 
-from src.settings import SettingsDialog
-from src.ui.custom_widgets import CustomTextEdit
+from src.chapters import scan_chapters
+from src.cleanup import RULES, cleaned_document
+from src.document import open_document
+from src.hotkeys import HotkeyDispatcher
+from src.library import DocumentLibrary
+from src.loader import FileLoader
+from src.profiler import Profiler
+from src.state import StateStore
+from src.ui.custom_widgets import BackgroundWidget, TextView
+from src.ui.frameless import FramelessController
+from src.ui.style_manager import StyleManager
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # 章节菜单中每组的章节数
+    CHAPTER_GROUP_SIZE = 100
+    # 阅读历史最多保留的文件数
+    HISTORY_LIMIT = 100
+    # 托盘“最近阅读”菜单中显示的文件数
+    RECENT_FILES = 10
+    # 滚动停止后多久保存阅读位置（毫秒）
+    POSITION_SAVE_DELAY = 1000
+    # 打开文件对话框的文件类型
+    FILE_FILTER = "文本文件 (*.txt *.gz *.bz2 *.xz *.zip *.epub *.html *.htm);;所有文件 (*)"
+    # 跟随模式下文件变化后多久读取新增内容（毫秒，合并连续的写入）
+    FOLLOW_DELAY = 100
+    # 样式更新的最小间隔（毫秒，约一帧）
+    STYLE_UPDATE_INTERVAL = 16
+    # 从启动到首次绘制的目标耗时（秒）
+    FIRST_PAINT_TARGET = 0.5
+    # 没有打开文件时显示的示例文本
+    SAMPLE_TEXT = "这是一个示例文本，窗口是半透明的，文本是只读的。"
+
+    def __init__(self, start_time=None, headless=False, settings=None, hotkey_backend=None,
+                 file_path=None, offset=None):
         super().__init__()
-        # 加载设置
-        self.settings = QSettings("StealthReader", "Settings")
+        # headless 模式不创建托盘、不注册全局快捷键（用于基准测试等自动化场景）
+        self.headless = headless
+        # 全局快捷键后端，为空时使用 keyboard 模块
+        self._hotkey_backend = hotkey_backend
+        self.hotkey_dispatcher = None
+        
+        # 加载设置和阅读状态（启动时一次读入，改动在后台批量写入）
+        if settings is None:
+            settings = StateStore(legacy=QSettings("StealthReader", "Settings"), parent=self)
+        self.settings = settings
         self.load_settings()
         
         # 设置无边框窗口
@@ -19,67 +59,136 @@ class MainWindow(QMainWindow):
         # 设置窗口透明背景
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         
-        # 创建主窗口部件
-        self.central_widget = QWidget()
+        # 创建主窗口部件（自绘背景）
+        self.central_widget = BackgroundWidget()
         self.setCentralWidget(self.central_widget)
         
         # 创建布局
         layout = QVBoxLayout(self.central_widget)
         layout.setContentsMargins(10, 10, 10, 10)
         
-        # 创建自定义文本编辑器（只读模式）
-        self.text_edit = CustomTextEdit()
-        self.text_edit.setReadOnly(True)
-        self.text_edit.setTextInteractionFlags(Qt.TextInteractionFlag.NoTextInteraction)
+        # 创建文本视图（只读，只排版和绘制可见的行）
+        self.text_edit = TextView()
+        # 文本区域透明，颜色通过调色板设置
+        self.text_edit.setFrameShape(QFrame.Shape.NoFrame)
+        self.text_edit.viewport().setAutoFillBackground(False)
         layout.addWidget(self.text_edit)
         
         # 设置初始窗口大小
         self.resize(800, 600)
         
-        # 用于窗口拖动和调整大小的变量
-        self._drag_pos = None
-        self._resizing = False
-        self._resize_direction = None
+        # 设置鼠标跟踪
         self.setMouseTracking(True)
         self.central_widget.setMouseTracking(True)
         self.text_edit.setMouseTracking(True)
         
+        # 自动滚动到达末尾时取消托盘菜单的勾选，方向键调整的速度写入设置
+        self.text_edit.set_auto_scroll_speed(self.scroll_speed)
+        self.text_edit.auto_scroll_stopped.connect(self._on_auto_scroll_stopped)
+        self.text_edit.auto_scroll_speed_changed.connect(self.set_scroll_speed)
+        
         # 设置调整大小的边距
         self.MARGINS = 8
         
-        # 加载文本文件（如果有）
-        if self.file_path:
-            self.load_file(self.file_path)
-        else:
-            # 添加一些示例文本
-            self.text_edit.setText("这是一个示例文本，窗口是半透明的，文本是只读的。")
-        
         # 最小窗口尺寸
         self.MIN_WIDTH = 200
         self.MIN_HEIGHT = 150
         
-        # 存储初始窗口位置和大小
-        self._initial_rect = None
-        self._initial_pos = None
-        
-        # 预定义鼠标指针
-        self._cursors = {
-            "topleft": QCursor(Qt.CursorShape.SizeFDiagCursor),
-            "bottomright": QCursor(Qt.CursorShape.SizeFDiagCursor),
-            "topright": QCursor(Qt.CursorShape.SizeBDiagCursor),
-            "bottomleft": QCursor(Qt.CursorShape.SizeBDiagCursor),
-            "left": QCursor(Qt.CursorShape.SizeHorCursor),
-            "right": QCursor(Qt.CursorShape.SizeHorCursor),
-            "top": QCursor(Qt.CursorShape.SizeVerCursor),
-            "bottom": QCursor(Qt.CursorShape.SizeVerCursor),
-            "default": QCursor(Qt.CursorShape.ArrowCursor)
-        }
+        # 边缘命中测试、鼠标指针和拖动/调整大小，拖动调整大小期间只重新排版可见区域
+        self.frameless = FramelessController(self, self.MARGINS, self.MIN_WIDTH, self.MIN_HEIGHT)
+        self.frameless.resize_started.connect(self.text_edit.begin_live_resize)
+        self.frameless.resize_finished.connect(self.text_edit.end_live_resize)
+        
+        # 当前打开的文档，以及正在后台加载的文档
+        self.document = None
+        self._pending_document = None
+        self._pending_offset = 0
+        # 后台读取出错时返回的文档：(文件路径, 字节偏移)
+        self._fallback = None
+        self._loader = None
+        # 最近打开过的文档缓存，切换回来时不必重新读取和建立索引
+        self.library = DocumentLibrary()
+        
+        # 跟随模式：监视当前文件，只读取末尾新增的内容
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._follow_timer = QTimer(self)
+        self._follow_timer.setSingleShot(True)
+        self._follow_timer.setInterval(self.FOLLOW_DELAY)
+        self._follow_timer.timeout.connect(self._read_appended)
         
         # 添加最小化到托盘按钮
         self.minimizeButton = QPushButton("🗕", self)
         self.minimizeButton.setGeometry(self.width() - 40, 10, 30, 30)
         self.minimizeButton.clicked.connect(self.hideToTray)
         
+        # 可选的性能记录：设置中的开关或环境变量 STEALTHREADER_PROFILE
+        self.profiler = Profiler(self)
+        self.text_edit.profiler = self.profiler
+        self._load_start = None
+        self.set_profiling(self.profiling)
+        
+        # 托盘、全局快捷键等非关键部分在首次绘制之后再创建
+        self.tray = None
+        self.chapters = []
+        self.search_index = None
+        self._search_dialog = None
+        self.first_paint_time = None
+        self._start_time = start_time if start_time is not None else time.perf_counter()
+        self.central_widget.first_painted.connect(self._on_first_paint)
+        
+        # 滚动停止一段时间后保存阅读位置，退出前也保存一次
+        self._position_timer = QTimer(self)
+        self._position_timer.setSingleShot(True)
+        self._position_timer.setInterval(self.POSITION_SAVE_DELAY)
+        self._position_timer.timeout.connect(self.save_position)
+        self.text_edit.verticalScrollBar().valueChanged.connect(lambda _value: self._position_timer.start())
+        
+        # 隐藏到托盘一段时间后释放内存
+        self._trim_timer = QTimer(self)
+        self._trim_timer.setSingleShot(True)
+        self._trim_timer.timeout.connect(self.trim_memory)
+        QApplication.instance().aboutToQuit.connect(self._on_about_to_quit)
+        
+        # 加载命令行指定的文件，或上次打开的文件（如果有），从上次的阅读位置开始
+        if file_path:
+            self.open_file(file_path, offset)
+        elif self.file_path:
+            self.load_file(self.file_path)
+        else:
+            # 添加一些示例文本
+            self.text_edit.set_text(self.SAMPLE_TEXT)
+        
+        # 样式更新合并到每帧最多一次
+        self._applied_style = None
+        self._style_timer = QTimer(self)
+        self._style_timer.setSingleShot(True)
+        self._style_timer.setInterval(self.STYLE_UPDATE_INTERVAL)
+        self._style_timer.timeout.connect(self.update_styles)
+        
+        # 应用样式
+        self.update_styles()
+    
+    def _on_first_paint(self):
+        """首次绘制完成：记录耗时，并在事件循环空闲时完成其余初始化"""
+        self.first_paint_time = time.perf_counter() - self._start_time
+        if os.environ.get("STEALTHREADER_TRACE_STARTUP"):
+            print(f"首次绘制耗时 {self.first_paint_time * 1000:.1f} ms"
+                  f"（目标 {self.FIRST_PAINT_TARGET * 1000:.0f} ms）", file=sys.stderr)
+        if not self.headless:
+            QTimer.singleShot(0, self._deferred_setup)
+    
+    def _deferred_setup(self):
+        """创建系统托盘并注册全局快捷键"""
+        if self.tray is not None:
+            return
+        self.setup_tray()
+        
+        # 设置全局快捷键
+        self.setup_global_hotkey()
+    
+    def setup_tray(self):
+        """创建系统托盘和托盘菜单"""
         # 创建系统托盘
         self.tray = QSystemTrayIcon(self)
         self.tray.setIcon(QIcon("./resources/icon.svg"))  # 使用自定义SVG图标
@@ -92,6 +201,30 @@ class MainWindow(QMainWindow):
         self.openFileAction = self.trayMenu.addAction("打开文件")
         self.openFileAction.triggered.connect(self.open_file_dialog)
         
+        # 最近阅读的文件，展开时按阅读历史生成
+        self.recentMenu = QMenu("最近阅读", self.trayMenu)
+        self.trayMenu.addMenu(self.recentMenu)
+        self.recentMenu.aboutToShow.connect(self._fill_recent_menu)
+        
+        # 章节跳转菜单，章节索引就绪后填充
+        self.chapterMenu = self.trayMenu.addMenu("章节")
+        self.chapterMenu.setEnabled(False)
+        
+        # 跟随模式，文件末尾有新内容时自动追加显示
+        self.followAction = self.trayMenu.addAction("跟随文件末尾")
+        self.followAction.setCheckable(True)
+        self.followAction.setChecked(self.follow)
+        self.followAction.toggled.connect(self.set_follow)
+        
+        # 自动滚动，速度在设置中调整，滚动时也可以用方向键调整
+        self.autoScrollAction = self.trayMenu.addAction("自动滚动")
+        self.autoScrollAction.setCheckable(True)
+        self.autoScrollAction.toggled.connect(self.text_edit.set_auto_scroll)
+        
+        # 全文搜索，搜索索引在后台建立
+        self.searchAction = self.trayMenu.addAction("搜索")
+        self.searchAction.triggered.connect(self.show_search)
+        
         # 添加设置菜单项
         self.settingsAction = self.trayMenu.addAction("设置")
         self.settingsAction.triggered.connect(self.show_settings)
@@ -105,12 +238,8 @@ class MainWindow(QMainWindow):
         
         # 托盘图标双击显示窗口
         self.tray.activated.connect(self.onTrayIconActivated)
-        
-        # 设置全局快捷键
-        self.setup_global_hotkey()
-        
-        # 应用样式
-        self.update_styles()
+                
+        self._rebuild_chapter_menu()
     
     def load_settings(self):
         """加载设置"""
@@ -119,208 +248,477 @@ class MainWindow(QMainWindow):
         self.text_color = QColor(self.settings.value("text_color", "#000000"))
         self.text_alpha = int(self.settings.value("text_alpha", 255))
         self.file_path = self.settings.value("file_path", "")
-    
-    def load_file(self, file_path):
-        """加载文本文件到编辑器"""
+        self.profiling = self.settings.value("profiling", False, type=bool)
+        self.follow = self.settings.value("follow", False, type=bool)
+        # 自动滚动速度（像素/秒）
+        self.scroll_speed = float(self.settings.value("scroll_speed", 30))
+        # 隐藏多久后释放文本和排版（秒），0 表示不释放
+        self.trim_delay = int(self.settings.value("trim_delay", 60))
+        # 全局快捷键：{动作: 组合键}，组合键为空表示不使用
+        self.hotkeys = {action: self.settings.value(f"hotkey_{action}", combo)
+                        for action, combo in HotkeyDispatcher.DEFAULT_BINDINGS.items()}
+        # 文本清理：启用的规则（为空表示不清理）和额外的广告关键词（正则表达式）
+        rules = self.settings.value("cleanup_rules", "")
+        self.cleanup_rules = tuple(name for name in rules.split(",") if name in RULES)
+        ad_pattern = self.settings.value("cleanup_ad_pattern", "")
+        self.cleanup_ad_patterns = (ad_pattern,) if ad_pattern else ()
+        # 阅读历史：[[文件路径, 字节偏移], ...]，最近阅读的在前
         try:
-            # 使用 Python 内置方式读取文件
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-                self.text_edit.setText(text)
-                
-                # 更新窗口标题以显示文件名
-                file_name = file_path.split("/")[-1].split("\\")[-1]
-                self.setWindowTitle(f"StealthReader - {file_name}")
-                return True
-        except UnicodeDecodeError:
-            # 如果 UTF-8 解码失败，尝试其他编码
+            self.history = json.loads(self.settings.value("history", "[]"))
+        except ValueError:
+            self.history = []
+    
+    def set_profiling(self, enabled):
+        """启用或停止性能记录，环境变量启用时始终记录"""
+        self.profiling = enabled
+        env_enabled, output, overlay = Profiler.environment()
+        if enabled or env_enabled:
+            self.profiler.start(output, overlay)
+        else:
+            self.profiler.stop()
+    
+    def set_cleanup(self, rules, ad_patterns):
+        """更改文本清理规则，并按新规则重新打开当前文档"""
+        rules, ad_patterns = tuple(rules), tuple(ad_patterns)
+        if (rules, ad_patterns) == (self.cleanup_rules, self.cleanup_ad_patterns):
+            return
+        self.cleanup_rules, self.cleanup_ad_patterns = rules, ad_patterns
+        # 缓存中的文档和排版是按旧规则清理的文本
+        for file_path in self.library.clear():
+            self.text_edit.paginator.discard(file_path)
+        if self.document is not None:
+            self.load_file(self.document.file_path, self.current_position())
+    
+    def current_position(self):
+        """返回当前阅读位置在原文件中的字节偏移（清理后的文本按行换算）"""
+        return self.document.to_source_offset(self.text_edit.current_offset())
+
+    def reading_position(self, file_path):
+        """返回文件上次阅读到的字节偏移（原文件中的偏移）"""
+        for path, offset in self.history:
+            if path == file_path:
+                return offset
+        return 0
+    
+    def save_position(self):
+        """将当前文档的阅读位置记入历史并保存"""
+        self._position_timer.stop()
+        if self.document is None:
+            return
+        path = self.document.file_path
+        offset = self.current_position()
+        history = [item for item in self.history if item[0] != path]
+        history.insert(0, [path, offset])
+        self.history = history[:self.HISTORY_LIMIT]
+        self.settings.setValue("history", json.dumps(self.history, ensure_ascii=False))
+    
+    def load_file(self, file_path, offset=None):
+        """加载文本文件到编辑器
+
+        文件在当前线程中打开，行索引在后台线程中建立，
+        索引出第一屏后立即显示，其余部分逐步追加。
+        offset 为空时从阅读历史中的位置开始；非零位置只索引附近的一段立即显示，
+        完整索引建立后再无缝切换。
+        最近打开过的文件从文档缓存中取出，已经建立的索引、章节和搜索索引直接复用。
+        """
+        self._load_start = time.perf_counter()
+        entry = self.library.take(file_path)
+        if entry is not None:
+            document = entry.document
+        else:
             try:
-                with open(file_path, 'r', encoding='gbk') as file:
-                    text = file.read()
-                    self.text_edit.setText(text)
-                    
-                    # 更新窗口标题以显示文件名
-                    file_name = file_path.split("/")[-1].split("\\")[-1]
-                    self.setWindowTitle(f"StealthReader - {file_name}")
-                    return True
+                # 通过内存映射打开文件，编辑器只显示可见窗口的文本
+                with self.profiler.measure("open"):
+                    document = open_document(file_path)
+                    # 纯文本按清理规则边清理边显示，清理结果按规则集缓存
+                    if self.cleanup_rules and document.RANDOM_ACCESS:
+                        document = cleaned_document(document, self.cleanup_rules, self.cleanup_ad_patterns)
             except Exception as e:
-                QMessageBox.critical(self, "错误", f"读取文件时出错 (GBK): {str(e)}")
+                QMessageBox.critical(self, "错误", f"读取文件时出错: {str(e)}")
                 return False
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"读取文件时出错: {str(e)}")
-            return False
+
+        # 取消尚未完成的加载
+        self._cancel_loading()
+        if self.document is not None and self.document.file_path != file_path:
+            self._fallback = (self.document.file_path, self.current_position())
+        else:
+            self._fallback = None
+
+        if offset is None:
+            offset = self.reading_position(file_path)
+        # 阅读位置按原文件保存，清理后的文本需要换算
+        position = document.from_source_offset(offset)
+        # 缓存中尚未索引完的文档，目标位置之后已经索引出足够的行时也直接显示
+        count = document.line_count()
+        window = self.text_edit.WINDOW_LINES
+        if document.complete or (count > window and position < document.offset_of_line(count - window)):
+            self._show_document(document, document, position)
+            if entry is not None and document.complete:
+                self.chapters = entry.chapters
+                self._rebuild_chapter_menu()
+                self.search_index = entry.search_index
+                if self.search_index is not None:
+                    # 缓存中的文档已经全部加载完成
+                    return True
+        else:
+            view = document.slice_around(position) if position and document.RANDOM_ACCESS else None
+            if view is not None:
+                self._show_document(document, view, position)
+            else:
+                # 只能顺序加载的文档（如压缩文件）或无法从行中间开始显示的局部，索引到阅读位置后再显示
+                self._pending_document = document
+                self._pending_offset = offset
+        self._loader = FileLoader(document, self.text_edit.WINDOW_LINES, self, offset)
+        self._loader.first_screen_ready.connect(self._on_first_screen_ready)
+        self._loader.progress.connect(self._on_load_progress)
+        self._loader.finished_loading.connect(self._on_load_finished)
+        self._loader.chapters_ready.connect(self._on_chapters_ready)
+        self._loader.search_ready.connect(self._on_search_ready)
+        self._loader.failed.connect(self._on_load_failed)
+        self._loader.finished.connect(self._on_loader_finished)
+        self._loader.start()
+        return True
+
+    def close_document(self):
+        """取消加载并关闭当前文档（放入文档缓存），改为显示示例文本
+
+        不保存阅读位置：用于撤销尚未确认的打开操作。
+        """
+        self._cancel_loading()
+        self._position_timer.stop()
+        document = self.document
+        self.document = None
+        self.text_edit.set_text(self.SAMPLE_TEXT)
+        if document is not None:
+            self._release_document(document, self.chapters, self.search_index)
+        self.chapters = []
+        self._rebuild_chapter_menu()
+        self.search_index = None
+        self.setWindowTitle("StealthReader")
+        self._watch_document()
+
+    def _cancel_loading(self):
+        """取消后台加载，并释放尚未显示的文档"""
+        if self._loader is not None:
+            self._loader.requestInterruption()
+            self._loader.wait()
+            self._loader = None
+        if self._pending_document is not None:
+            self._pending_document.close()
+            self._pending_document = None
+
+    def _on_first_screen_ready(self, document):
+        """第一屏已索引完成，立即显示"""
+        if document is not self._pending_document:
+            return
+        self._pending_document = None
+        self._show_document(document, document, document.from_source_offset(self._pending_offset))
+
+    def _show_document(self, document, source, offset=0):
+        """切换到新文档，source 可以是文档本身或其中的一段"""
+        self.save_position()
+        old_document = self.document
+        old_chapters, old_search_index = self.chapters, self.search_index
+        self.document = document
+        if old_document is not None and old_document is not document and old_document.file_path == document.file_path:
+            # 重新打开的同一文件内容可能已经不同（文件被替换、清理规则变化），丢弃旧的排版
+            self.text_edit.paginator.discard(document.file_path)
+        self.text_edit.set_source(source, offset)
+        self._record_load("first_screen")
+        if old_document is not None:
+            self._release_document(old_document, old_chapters, old_search_index)
+        self.chapters = []
+        self._rebuild_chapter_menu()
+        self.search_index = None
+        self._update_title()
+        self._watch_document()
+
+    def _release_document(self, document, chapters, search_index):
+        """不再显示的文档放入文档缓存（未完成的索引下次打开时继续建立）"""
+        if self.document is not None and document.file_path == self.document.file_path:
+            # 重新打开了同一个文件，旧文档不再需要
+            document.close()
+            return
+        for file_path in self.library.put(document, chapters, search_index):
+            self.text_edit.paginator.discard(file_path)
+
+    def _on_load_progress(self, document, indexed, size):
+        """后台索引有进展时补齐显示窗口"""
+        if document is not self.document:
+            return
+        self.text_edit.source_extended()
+        self._update_title(indexed * 100 // size if size else 100)
+
+    def _on_load_finished(self, document):
+        """后台索引完成"""
+        if document is not self.document:
+            return
+        if self.text_edit.source is not document:
+            # 从局部索引切换到完整文档，保持当前阅读位置
+            self.text_edit.set_source(document, self.text_edit.current_offset())
+        else:
+            self.text_edit.source_extended()
+        self._update_title()
+        self._record_load("index")
+
+    def _on_load_failed(self, document, message):
+        """后台读取出错（如压缩数据损坏）：提示错误，回到之前打开的文档"""
+        if document is not self.document and document is not self._pending_document:
+            return
+        # 等待后台线程退出（尚未显示的文档在这里关闭）
+        self._cancel_loading()
+        QMessageBox.critical(self, "错误", f"读取文件时出错: {message}")
+        if document is self.document:
+            self.document = None
+            self.text_edit.set_text(self.SAMPLE_TEXT)
+            document.close()
+        fallback, self._fallback = self._fallback, None
+        if self.file_path == document.file_path:
+            self.file_path = fallback[0] if fallback else ""
+            self.settings.setValue("file_path", self.file_path)
+        if fallback is None or not self.load_file(*fallback):
+            self.close_document()
+
+    def _on_loader_finished(self):
+        """后台线程结束后释放加载器"""
+        loader = self.sender()
+        if loader is self._loader:
+            self._loader = None
+            # 加载期间追加的内容在加载完成后读取
+            if self.follow:
+                self._follow_timer.start()
+        loader.deleteLater()
+
+    def set_scroll_speed(self, speed):
+        """设置并保存自动滚动速度（像素/秒）"""
+        self.text_edit.set_auto_scroll_speed(speed)
+        self.scroll_speed = self.text_edit.auto_scroll_speed
+        self.settings.setValue("scroll_speed", self.scroll_speed)
+
+    def _on_auto_scroll_stopped(self):
+        if self.tray is not None:
+            self.autoScrollAction.setChecked(False)
+
+    def set_follow(self, enabled):
+        """开启或关闭跟随模式"""
+        self.follow = enabled
+        self.settings.setValue("follow", enabled)
+        self._watch_document()
+        if enabled:
+            self._follow_timer.start()
+
+    def _watch_document(self):
+        """跟随模式下只监视当前文档"""
+        files = self._watcher.files()
+        if files:
+            self._watcher.removePaths(files)
+        if self.follow and self.document is not None:
+            self._watcher.addPath(self.document.file_path)
+
+    def _on_file_changed(self, path):
+        """文件发生变化，稍后读取新增内容"""
+        # 文件被替换（如先删除再写入）后监视会失效，重新添加
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+        self._follow_timer.start()
+
+    def _read_appended(self):
+        """读取文件末尾新增的字节，为新增的行建立索引并追加到视图"""
+        document = self.document
+        if (not self.follow or document is None or self._loader is not None
+                or self.text_edit.source is not document):
+            return
+        previous = document.line_count()
+        grown = document.grow()
+        if grown < 0:
+            # 文件被截断或替换，重新打开
+            self.load_file(document.file_path, self.current_position())
+            return
+        if not grown:
+            return
+        # 原来的最后一行可能尚未写完（清理后的文本还会截掉由它产生的行），从这一行开始更新
+        last_line = max(0, min(previous, document.line_count()) - 1)
+        document.build_index()
+
+        self.text_edit.paginator.invalidate_from(document.file_path, document.offset_of_line(last_line))
+        self.text_edit.source_appended(previous)
+
+        # 原来的最后一行中识别出的标题可能只写了一半，丢弃后和新增的行一起重新扫描
+        start = document.offset_of_line(last_line)
+        chapters = [item for item in self.chapters if item[0] < start] + scan_chapters(document, None, last_line)
+        if chapters != self.chapters:
+            self.chapters = chapters
+            self._rebuild_chapter_menu()
+
+    def _on_chapters_ready(self, document, chapters):
+        """章节索引就绪"""
+        if document is not self.document:
+            return
+        self.chapters = chapters
+        self._rebuild_chapter_menu()
+        self._record_load("chapters")
+
+    def _on_search_ready(self, document, index):
+        """搜索索引就绪"""
+        if document is not self.document:
+            return
+        self.search_index = index
+        self._record_load("search_index")
+    
+    def _record_load(self, stage):
+        """记录从开始打开文件到某个加载阶段完成的耗时"""
+        if self._load_start is not None:
+            self.profiler.record(stage, time.perf_counter() - self._load_start)
+
+    def _rebuild_chapter_menu(self):
+        """重建托盘中的章节菜单，章节较多时分组并在展开时才创建菜单项"""
+        if self.tray is None:
+            return
+        # clear() 只移除菜单项，分组子菜单是章节菜单的子对象，需要单独删除
+        for submenu in self.chapterMenu.findChildren(QMenu, options=Qt.FindChildOption.FindDirectChildrenOnly):
+            submenu.deleteLater()
+        self.chapterMenu.clear()
+        self.chapterMenu.setEnabled(bool(self.chapters))
+        count = len(self.chapters)
+        if count <= self.CHAPTER_GROUP_SIZE:
+            self._fill_chapter_menu(self.chapterMenu, 0, count)
+            return
+        for start in range(0, count, self.CHAPTER_GROUP_SIZE):
+            end = min(count, start + self.CHAPTER_GROUP_SIZE)
+            submenu = QMenu(f"{start + 1} - {end}", self.chapterMenu)
+            self.chapterMenu.addMenu(submenu)
+            submenu.aboutToShow.connect(
+                lambda menu=submenu, start=start, end=end: self._fill_chapter_menu(menu, start, end))
+
+    def _fill_chapter_menu(self, menu, start, end):
+        """向菜单中添加 [start, end) 范围的章节"""
+        if not menu.isEmpty():
+            return
+        for offset, title in self.chapters[start:end]:
+            action = menu.addAction(title)
+            action.triggered.connect(lambda checked=False, offset=offset: self.jump_to_offset(offset))
+
+    def _fill_recent_menu(self):
+        """按阅读历史生成最近阅读的文件列表"""
+        self.recentMenu.clear()
+        current = self.document.file_path if self.document is not None else None
+        for path, _offset in self.history[:self.RECENT_FILES]:
+            action = self.recentMenu.addAction(os.path.basename(path) or path)
+            action.setToolTip(path)
+            action.setCheckable(True)
+            action.setChecked(path == current)
+            action.triggered.connect(lambda checked=False, path=path: self.open_file(path))
+        if self.recentMenu.isEmpty():
+            self.recentMenu.addAction("（无）").setEnabled(False)
+
+    def jump_to_offset(self, offset):
+        """跳转到指定字节偏移"""
+        self.text_edit.scroll_to_offset(offset)
+        if not self.isVisible():
+            self.showNormal()
+
+    def _update_title(self, percent=None):
+        """更新窗口标题以显示文件名和加载进度"""
+        file_name = self.document.file_path.split("/")[-1].split("\\")[-1]
+        if percent is None:
+            self.setWindowTitle(f"StealthReader - {file_name}")
+        else:
+            self.setWindowTitle(f"StealthReader - {file_name} (载入中 {percent}%)")
     
     def open_file_dialog(self):
         """打开文件选择对话框"""
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择文本文件", "", "文本文件 (*.txt);;所有文件 (*)", options=options
+            self, "选择文本文件", "", self.FILE_FILTER, options=options
         )
         
         if file_path:
-            if self.load_file(file_path):
-                self.file_path = file_path
-                self.settings.setValue("file_path", file_path)
+            self.open_file(file_path)
+    
+    def open_file(self, file_path, offset=None):
+        """打开文件并设为默认打开的文件"""
+        if self.load_file(file_path, offset):
+            self.file_path = file_path
+            self.settings.setValue("file_path", file_path)
+    
+    def open_forwarded(self, file_path, offset):
+        """打开另一次启动转发过来的文件并显示窗口，file_path 为空时只显示窗口"""
+        current = self.document.file_path if self.document is not None else None
+        try:
+            same = bool(file_path and current) and os.path.samefile(file_path, current)
+        except OSError:
+            same = False
+        if same:
+            # 已经打开的文件只跳转位置
+            if offset is not None:
+                self.jump_to_offset(self.document.from_source_offset(offset))
+        elif file_path:
+            self.open_file(file_path, offset)
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+    
+    def request_style_update(self):
+        """请求更新样式，同一帧内的多次请求只更新一次"""
+        if not self._style_timer.isActive():
+            self._style_timer.start()
     
     def update_styles(self):
-        """更新样式"""
-        # 设置主窗口样式
-        self.central_widget.setStyleSheet(f"""
-            QWidget {{
-                background: rgba({self.bg_color.red()}, {self.bg_color.green()}, {self.bg_color.blue()}, {self.bg_alpha});
-                border: none;
-                border-radius: 5px;
-            }}
-            QTextEdit {{
-                border: none;
-                background: transparent;
-                color: rgba({self.text_color.red()}, {self.text_color.green()}, {self.text_color.blue()}, {self.text_alpha});
-                selection-background-color: transparent;
-                selection-color: inherit;
-            }}
-        """)
-        
-        # 更新按钮样式
-        self.minimizeButton.setStyleSheet(f"""
-            QPushButton {{
-                background-color: rgba({self.bg_color.red()}, {self.bg_color.green()}, {self.bg_color.blue()}, 50);
-                color: rgba({self.text_color.red()}, {self.text_color.green()}, {self.text_color.blue()}, {self.text_alpha});
-                border: none;
-                border-radius: 3px;
-                padding: 5px;
-                font-size: 16px;
-                min-width: 30px;
-                min-height: 30px;
-            }}
-            QPushButton:hover {{
-                background-color: rgba({self.bg_color.red()}, {self.bg_color.green()}, {self.bg_color.blue()}, 100);
-            }}
-        """)
+        """更新样式
+
+        背景自绘、文字颜色使用调色板，都按颜色缓存，颜色没有变化时不做任何事，
+        避免重新解析样式表并重新应用到所有子部件。
+        """
+        self._style_timer.stop()
+        key = (self.bg_color.rgb(), self.bg_alpha, self.text_color.rgb(), self.text_alpha)
+        if key == self._applied_style:
+            return
+        self._applied_style = key
+        
+        with self.profiler.measure("style"):
+            # 设置主窗口背景和文字颜色
+            self.central_widget.set_background(StyleManager.get_background_color(self.bg_color, self.bg_alpha))
+            self.text_edit.setPalette(StyleManager.get_text_palette(self.text_color, self.text_alpha))
+            
+            # 更新按钮样式（只有按钮自身需要重新应用）
+            button_style = StyleManager.get_button_style(self.bg_color, self.text_color, self.text_alpha)
+            if button_style != self.minimizeButton.styleSheet():
+                self.minimizeButton.setStyleSheet(button_style)
     
     def show_settings(self):
         """显示设置对话框"""
+        from src.settings import SettingsDialog
+        
         dialog = SettingsDialog(self)
         if dialog.exec():
             # 设置已经在对话框的save_settings方法中保存
             pass
     
+    def show_search(self):
+        """显示搜索对话框（非模态，可以边搜索边跳转）"""
+        if self._search_dialog is None:
+            from src.search_dialog import SearchDialog
+            self._search_dialog = SearchDialog(self)
+        self._search_dialog.show()
+        self._search_dialog.raise_()
+        self._search_dialog.activateWindow()
+    
     def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
-            # 存储初始窗口位置和大小
-            self._initial_rect = self.geometry()
-            self._initial_pos = event.globalPosition().toPoint()
-            
-            # 检查是否在窗口边缘
-            pos = event.position()
-            x, y = pos.x(), pos.y()
-            width, height = self.width(), self.height()
-            
-            # 确定调整方向
-            self._resize_direction = self._get_resize_direction(x, y, width, height)
-            
-            if self._resize_direction:
-                self._resizing = True
-                QApplication.setOverrideCursor(self._cursors[self._resize_direction])
-            else:
-                self._drag_pos = event.globalPosition().toPoint()
-                QApplication.setOverrideCursor(self._cursors["default"])
-
-    def _get_resize_direction(self, x, y, width, height):
-        """确定调整方向"""
-        left = x <= self.MARGINS
-        right = x >= width - self.MARGINS
-        top = y <= self.MARGINS
-        bottom = y >= height - self.MARGINS
-        
-        if left and top:
-            return "topleft"
-        elif left and bottom:
-            return "bottomleft"
-        elif right and top:
-            return "topright"
-        elif right and bottom:
-            return "bottomright"
-        elif left:
-            return "left"
-        elif right:
-            return "right"
-        elif top:
-            return "top"
-        elif bottom:
-            return "bottom"
-        return None
+        self.frameless.press(event)
 
     def mouseMoveEvent(self, event):
-        if self._resizing and event.buttons() == Qt.MouseButton.LeftButton:
-            # 计算鼠标移动的距离
-            current_pos = event.globalPosition().toPoint()
-            dx = current_pos.x() - self._initial_pos.x()
-            dy = current_pos.y() - self._initial_pos.y()
-            
-            # 获取初始几何信息
-            x = self._initial_rect.x()
-            y = self._initial_rect.y()
-            width = self._initial_rect.width()
-            height = self._initial_rect.height()
-            
-            # 根据调整方向计算新的几何信息
-            new_x, new_y, new_width, new_height = x, y, width, height
-            
-            if "left" in self._resize_direction:
-                new_x = x + dx
-                new_width = max(self.MIN_WIDTH, width - dx)
-                if new_width == self.MIN_WIDTH:
-                    new_x = x + width - self.MIN_WIDTH
-            
-            if "right" in self._resize_direction:
-                new_width = max(self.MIN_WIDTH, width + dx)
-            
-            if "top" in self._resize_direction:
-                new_y = y + dy
-                new_height = max(self.MIN_HEIGHT, height - dy)
-                if new_height == self.MIN_HEIGHT:
-                    new_y = y + height - self.MIN_HEIGHT
-            
-            if "bottom" in self._resize_direction:
-                new_height = max(self.MIN_HEIGHT, height + dy)
-            
-            # 应用新的几何信息
-            self.setGeometry(new_x, new_y, new_width, new_height)
-                    
-        elif event.buttons() == Qt.MouseButton.LeftButton and self._drag_pos is not None:
-            # 移动窗口
-            new_pos = event.globalPosition().toPoint()
-            self.move(self.pos() + new_pos - self._drag_pos)
-            self._drag_pos = new_pos
-        else:
-            # 更新鼠标形状
-            pos = event.position()
-            x, y = pos.x(), pos.y()
-            width, height = self.width(), self.height()
-            
-            direction = self._get_resize_direction(x, y, width, height)
-            self._update_cursor(direction)
-
-    def _update_cursor(self, direction):
-        """根据调整方向更新鼠标形状"""
-        QApplication.restoreOverrideCursor()  # 恢复之前的覆盖指针
-        
-        if direction:
-            QApplication.setOverrideCursor(self._cursors[direction])
-        else:
-            QApplication.setOverrideCursor(self._cursors["default"])
+        self.frameless.move(event)
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
-            self._drag_pos = None
-            self._resizing = False
-            self._resize_direction = None
-            self._initial_rect = None
-            self._initial_pos = None
-            QApplication.restoreOverrideCursor()  # 恢复默认鼠标指针
+        self.frameless.release(event)
+
+    def leaveEvent(self, event):
+        self.frameless.leave()
+        super().leaveEvent(event)
 
     def hideToTray(self):
         """隐藏窗口到系统托盘"""
+        self.save_position()
         self.hide()
         
     def onTrayIconActivated(self, reason):
@@ -334,42 +732,118 @@ class MainWindow(QMainWindow):
         self.minimizeButton.move(self.width() - 40, 10)
 
     def setup_global_hotkey(self):
-        """设置全局快捷键"""
-        # 检查管理员权限
-        from src.utils import is_admin
-        
-        if not is_admin():
-            QMessageBox.warning(
-                self, 
-                "权限不足", 
-                "全局快捷键功能需要管理员权限才能正常工作。\n"
-                "请右键点击程序，选择'以管理员身份运行'。\n"
-                "程序将继续运行，但全局快捷键可能无效。"
-            )
-        
-        # 注册全局快捷键
-        try:
-            # 注册 Ctrl+Alt+H 用于隐藏/显示窗口
-            keyboard.add_hotkey('ctrl+alt+h', self.toggle_visibility)
+        """设置全局快捷键
+
+        快捷键回调在钩子线程中触发，动作通过队列信号转到界面线程执行。
+        """
+        backend = self._hotkey_backend
+        if backend is None:
+            # 检查管理员权限
+            from src.utils import is_admin
+            
+            if not is_admin():
+                QMessageBox.warning(
+                    self, 
+                    "权限不足", 
+                    "全局快捷键功能需要管理员权限才能正常工作。\n"
+                    "请右键点击程序，选择'以管理员身份运行'。\n"
+                    "程序将继续运行，但全局快捷键可能无效。"
+                )
             
-            # 在菜单中添加快捷键提示
-            self.showAction.setText("显示 (Ctrl+Alt+H)")
-        except Exception as e:
-            QMessageBox.critical(self, "快捷键注册失败", f"无法注册全局快捷键: {str(e)}")
+            try:
+                from src.hotkeys import KeyboardBackend
+                backend = KeyboardBackend()
+            except Exception as e:
+                QMessageBox.critical(self, "快捷键注册失败", f"无法注册全局快捷键: {str(e)}")
+                return
+        
+        self.hotkey_dispatcher = HotkeyDispatcher(backend, self)
+        self.hotkey_dispatcher.bind("boss", self.toggle_visibility)
+        self.hotkey_dispatcher.bind("page_up", self.text_edit.page_up)
+        self.hotkey_dispatcher.bind("page_down", self.text_edit.page_down)
+        self.hotkey_dispatcher.handled.connect(self._on_hotkey_handled)
+        self.set_hotkeys(self.hotkeys)
+    
+    def set_hotkeys(self, bindings):
+        """重新注册全局快捷键"""
+        self.hotkeys = dict(bindings)
+        if self.hotkey_dispatcher is None:
+            return
+        failed = self.hotkey_dispatcher.register(self.hotkeys)
+        if failed:
+            message = "\n".join(f"{combo}: {error}" for _action, combo, error in failed)
+            QMessageBox.critical(self, "快捷键注册失败", f"无法注册全局快捷键:\n{message}")
+        
+        # 在菜单中添加快捷键提示
+        if self.tray is not None:
+            combo = self.hotkey_dispatcher.bindings.get("boss")
+            if combo:
+                key_text = "+".join(part.capitalize() for part in combo.split("+"))
+                self.showAction.setText(f"显示 ({key_text})")
+            else:
+                self.showAction.setText("显示")
+    
+    def _on_hotkey_handled(self, action, latency):
+        """记录从按下快捷键到动作完成的延迟"""
+        self.profiler.record(f"hotkey_{action}", latency)
     
     def toggle_visibility(self):
         """切换窗口的可见状态"""
         if self.isVisible():
+            self.save_position()
             self.hide()
         else:
             self.showNormal()
             self.activateWindow()  # 确保窗口获得焦点
     
+    def _on_about_to_quit(self):
+        """程序退出前保存阅读位置并停止后台加载"""
+        self.save_position()
+        self._cancel_loading()
+        self.library.clear()
+        self.profiler.stop()
+        if isinstance(self.settings, StateStore):
+            self.settings.close()
+
+    def hideEvent(self, event):
+        """窗口隐藏（hideToTray、老板键）后开始计时，到时释放内存"""
+        super().hideEvent(event)
+        if self.trim_delay > 0:
+            self._trim_timer.start(self.trim_delay * 1000)
+
+    def showEvent(self, event):
+        # 编辑器在自己的 showEvent 中恢复释放的文本
+        super().showEvent(event)
+        self._trim_timer.stop()
+
+    def trim_memory(self):
+        """释放隐藏期间用不到的内存
+
+        编辑器中的文本和排版、分页缓存、图片缓存、文档缓存和内存映射读入的页面都可以重新生成，
+        只保留阅读位置和各种索引；显示时只重新排版可见的几行。
+        """
+        if self.isVisible():
+            return
+        self.save_position()
+        self.text_edit.release()
+        self.text_edit.paginator.clear()
+        if self.document is not None:
+            self.document.trim()
+        self.library.trim()
+        QPixmapCache.clear()
+        from src.utils import trim_process_memory
+        trim_process_memory()
+
     def closeEvent(self, event):
         """关闭事件处理"""
+        self.save_position()
+        self._cancel_loading()
+        self.library.clear()
+        
         # 程序退出前清理快捷键注册
         try:
-            keyboard.unhook_all()
+            if self.hotkey_dispatcher is not None:
+                self.hotkey_dispatcher.close()
         except:
             pass
         event.accept() 
\ No newline at end of file
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+
+from PySide6.QtGui import QTextLayout, QTextOption
+
+
+class Paginator:
+    """按 (文件, 宽度, 字体) 计算并缓存分页位置
+
+    分页以整行为单位：一页从某一行开始，包含能完整放入视口高度的若干行。
+    行高和分页位置都以行首字节偏移为键缓存，因此局部索引和完整文档可以共用缓存。
+    只计算视口附近用到的行，其余部分由视图在空闲时补算。
+    """
+
+    # 最多保留的布局缓存数（每种宽度和字体组合一份）
+    CACHE_KEYS = 8
+
+    def __init__(self):
+        self._layouts = OrderedDict()
+
+    def _layout(self, source, width, font):
+        """返回某个布局键对应的缓存：{'heights': {偏移: 行高}, 'next': {页首: 下一页首}}"""
+        key = (source.file_path, width, font.key())
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = {'heights': {}, 'next': {}}
+            while len(self._layouts) > self.CACHE_KEYS:
+                self._layouts.popitem(last=False)
+        else:
+            self._layouts.move_to_end(key)
+        return layout
+
+    def clear(self):
+        """丢弃所有布局缓存"""
+        self._layouts.clear()
+
+    def discard(self, file_path):
+        """丢弃某个文件的所有布局缓存"""
+        for key in [key for key in self._layouts if key[0] == file_path]:
+            del self._layouts[key]
+
+    def invalidate_from(self, file_path, offset):
+        """文件从 offset 开始的内容发生变化，丢弃受影响的行高和分页位置"""
+        for key, layout in self._layouts.items():
+            if key[0] != file_path:
+                continue
+            heights = layout['heights']
+            for line_offset in [item for item in heights if item >= offset]:
+                del heights[line_offset]
+            pages = layout['next']
+            for page in [page for page, end in pages.items() if end >= offset]:
+                del pages[page]
+
+    def line_height(self, source, line, width, font):
+        """返回某一行在给定宽度下排版后的高度（像素）"""
+        heights = self._layout(source, width, font)['heights']
+        offset = source.offset_of_line(line)
+        height = heights.get(offset)
+        if height is None:
+            height = heights[offset] = self._measure(source.get_text(line, line + 1), width, font)
+        return height
+
+    def set_line_height(self, source, line, width, font, height):
+        """记录视图排版时得到的行高，分页时不必再次排版"""
+        self._layout(source, width, font)['heights'][source.offset_of_line(line)] = height
+
+    def _measure(self, text, width, font):
+        """使用 QTextLayout 折行并累计行高（折行方式与视图相同）"""
+        layout = QTextLayout(text, font)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(option)
+        layout.beginLayout()
+        height = 0.0
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(width)
+            height += line.height()
+        layout.endLayout()
+        return height
+
+    def next_page(self, source, line, width, height, font):
+        """返回从 line 开始的一页之后的下一页首行"""
+        layout = self._layout(source, width, font)
+        offset = source.offset_of_line(line)
+        count = source.line_count()
+        cached = layout['next'].get((offset, height))
+        if cached is not None:
+            return min(source.line_at_offset(cached), count - 1)
+
+        used, end = 0.0, line
+        while end < count:
+            used += self.line_height(source, end, width, font)
+            if used > height and end > line:
+                break
+            end += 1
+        if end < count or source.complete:
+            # 还在建立索引时，到达已索引的末尾只是暂时的结果，不缓存
+            layout['next'][(offset, height)] = source.offset_of_line(min(end, count - 1))
+        return min(end, count - 1)
+
+    def previous_page(self, source, line, width, height, font):
+        """返回结束于 line 之前的一页的首行"""
+        used, start = 0.0, line
+        while start > 0:
+            used += self.line_height(source, start - 1, width, font)
+            if used > height and start < line:
+                break
+            start -= 1
+        return start
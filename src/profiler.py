@@ -0,0 +1,220 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+from PySide6.QtWidgets import QLabel
+from PySide6.QtCore import Qt, QObject, QTimer
+
+from src.cache import cache_root
+
+
+def memory_usage():
+    """返回 (当前常驻内存, 峰值常驻内存)，单位字节，无法获取时为 None"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize, counters.PeakWorkingSetSize
+        return None, None
+
+    try:
+        values = {}
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, value, _unit = line.split()
+                    values[name] = int(value) * 1024
+        return values.get('VmRSS:'), values.get('VmHWM:')
+    except OSError:
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，其他系统以 KB 为单位
+    return None, peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profiler(QObject):
+    """可选的性能记录
+
+    记录加载、解码、排版、绘制等耗时、事件循环卡顿和内存占用，
+    定期以 JSON 行追加写入文件，也可以在窗口左上角显示一个小浮层。
+    未启用时 measure() 和 record() 几乎没有开销。
+
+    通过设置中的开关启用，或设置环境变量 STEALTHREADER_PROFILE：
+    值为 1 时写入默认文件，为 overlay 时同时显示浮层，其他值视为输出文件路径。
+    """
+
+    ENV_VAR = "STEALTHREADER_PROFILE"
+    # 写入快照的间隔（毫秒）
+    SNAPSHOT_INTERVAL = 10000
+    # 浮层刷新间隔（毫秒）
+    OVERLAY_INTERVAL = 1000
+    # 检测事件循环卡顿的定时器间隔（毫秒）
+    STALL_CHECK_INTERVAL = 50
+    # 超过预期间隔多久算作一次卡顿（秒）
+    STALL_THRESHOLD = 0.1
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.enabled = False
+        self.output = None
+        self.overlay = None
+        self._started = time.perf_counter()
+        # 名称 -> [次数, 总耗时, 最大耗时, 最近一次耗时]，每次写入快照后清空
+        self._timings = {}
+        self._last_tick = None
+
+        self._stall_timer = QTimer(self)
+        self._stall_timer.setInterval(self.STALL_CHECK_INTERVAL)
+        self._stall_timer.timeout.connect(self._check_stall)
+        self._snapshot_timer = QTimer(self)
+        self._snapshot_timer.setInterval(self.SNAPSHOT_INTERVAL)
+        self._snapshot_timer.timeout.connect(self.write_snapshot)
+        self._overlay_timer = QTimer(self)
+        self._overlay_timer.setInterval(self.OVERLAY_INTERVAL)
+        self._overlay_timer.timeout.connect(self._update_overlay)
+
+    @classmethod
+    def environment(cls):
+        """解析环境变量，返回 (是否启用, 输出文件, 是否显示浮层)"""
+        value = os.environ.get(cls.ENV_VAR, "")
+        if not value or value == "0":
+            return False, None, False
+        if value in ("1", "overlay"):
+            return True, None, value == "overlay"
+        return True, value, False
+
+    def start(self, output=None, overlay=False):
+        """开始记录，output 为空时写入缓存目录下的 profile.jsonl"""
+        self.output = output or os.path.join(cache_root(), "profile.jsonl")
+        if overlay and self.overlay is None:
+            self.overlay = QLabel(self.window)
+            self.overlay.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+            self.overlay.setStyleSheet(
+                "background-color: rgba(0, 0, 0, 160); color: white; font-size: 9pt; padding: 4px;")
+            self.overlay.move(10, 10)
+            self.overlay.show()
+            self._overlay_timer.start()
+        if self.enabled:
+            return
+        self.enabled = True
+        self._timings = {}
+        self._last_tick = time.perf_counter()
+        self._stall_timer.start()
+        self._snapshot_timer.start()
+
+    def stop(self):
+        """停止记录，并写入最后一次快照"""
+        if not self.enabled:
+            return
+        self.write_snapshot()
+        self.enabled = False
+        self._stall_timer.stop()
+        self._snapshot_timer.stop()
+        self._overlay_timer.stop()
+        if self.overlay is not None:
+            self.overlay.deleteLater()
+            self.overlay = None
+
+    def measure(self, name):
+        """返回记录一段代码耗时的上下文管理器"""
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        """记录一次耗时（秒）"""
+        if not self.enabled:
+            return
+        stats = self._timings.get(name)
+        if stats is None:
+            self._timings[name] = [1, seconds, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] = seconds
+
+    def _check_stall(self):
+        """定时器触发得比预期晚，说明事件循环被阻塞"""
+        now = time.perf_counter()
+        late = now - self._last_tick - self.STALL_CHECK_INTERVAL / 1000
+        self._last_tick = now
+        if late > self.STALL_THRESHOLD:
+            self.record("stall", late)
+
+    def snapshot(self):
+        """返回自上次快照以来的统计"""
+        rss, peak_rss = memory_usage()
+        timings = {}
+        for name, (count, total, longest, last) in sorted(self._timings.items()):
+            timings[name] = {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / count * 1000, 3),
+                "max_ms": round(longest * 1000, 3),
+                "last_ms": round(last * 1000, 3),
+            }
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "uptime": round(time.perf_counter() - self._started, 3),
+            "rss": rss,
+            "peak_rss": peak_rss,
+            "timings": timings,
+        }
+
+    def write_snapshot(self):
+        """追加一行快照到输出文件，并开始新的统计区间"""
+        line = json.dumps(self.snapshot(), ensure_ascii=False)
+        self._timings = {}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.output)), exist_ok=True)
+            with open(self.output, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        except OSError:
+            pass
+
+    def _update_overlay(self):
+        """在浮层中显示当前统计区间内各项的最近和最大耗时"""
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot["rss"] is not None:
+            lines.append(f"内存 {snapshot['rss'] / 1024 / 1024:.1f} MB")
+        for name, stats in snapshot["timings"].items():
+            lines.append(f"{name} {stats['last_ms']:.1f} / {stats['max_ms']:.1f} ms ×{stats['count']}")
+        self.overlay.setText("\n".join(lines))
+        self.overlay.adjustSize()
+        self.overlay.raise_()
@@ -0,0 +1,202 @@
+import marshal
+import operator
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+
+def decode_block(document, start_line, end_line):
+    """解码 [start_line, end_line) 行，软换行（拆开的长行）处不插入换行
+
+    返回 (文本, 各段在文本中的起始位置, 各段的起始行号)，每段从行首或软换行处开始。
+    """
+    soft_lines = document.soft_lines
+    lines = [start_line, *soft_lines[bisect_right(soft_lines, start_line):bisect_left(soft_lines, end_line)]]
+    bounds = lines + [end_line]
+    pieces = [document.get_text(bounds[i], bounds[i + 1]) for i in range(len(lines))]
+    starts = [0, *accumulate(map(len, pieces[:-1]))]
+    return ''.join(pieces), starts, lines
+
+
+def is_soft_line(document, line):
+    """line 是否从软换行处开始（与上一行属于原文的同一行）"""
+    soft_lines = document.soft_lines
+    i = bisect_left(soft_lines, line)
+    return i < len(soft_lines) and soft_lines[i] == line
+
+
+class SearchIndex:
+    """单字和二元组倒排索引
+
+    文档按行边界切分为约 BLOCK_SIZE 字节的块，每个单字和二元组记录出现过的块号。
+    查询时对各二元组（单字查询时为单字）的块号求交集，只解码候选块确认命中位置。
+    没有换行的长文本中块边界可能落在软换行处，跨边界的二元组记在前一块中，
+    查询时前一块也作为候选，并接上后一块开头的几个字确认命中。
+    """
+
+    BLOCK_SIZE = 64 * 1024
+    VERSION = 3
+    CACHE_NAME = 'search.idx'
+
+    def __init__(self, document, block_lines, postings, typecode):
+        self.document = document
+        # 每块的起始行号，末尾附加总行数
+        self.block_lines = block_lines
+        # 二元组 -> 块号数组（从缓存读取时为原始字节，用到时再转换）
+        self.postings = postings
+        self.typecode = typecode
+        # 从软换行处开始的块号，用到时再计算
+        self._soft_blocks = None
+
+    @classmethod
+    def build(cls, document, cancelled=None):
+        """扫描整个文档建立索引，cancelled 返回 True 时中止并返回 None"""
+        typecode = 'H' if document.size // cls.BLOCK_SIZE + 1 < 0x10000 else 'I'
+        block_lines = array('Q')
+        postings = {}
+        total = document.line_count()
+        line = 0
+
+        while line < total:
+            if cancelled is not None and cancelled():
+                return None
+            boundary = document.offset_of_line(line) + cls.BLOCK_SIZE
+            end_line = max(line + 1, min(total, document.line_at_offset(boundary) + 1))
+            block = len(block_lines)
+            block_lines.append(line)
+
+            text = decode_block(document, line, end_line)[0]
+            if end_line < total and is_soft_line(document, end_line):
+                # 跨过块边界的二元组记在这一块中
+                text += document.get_text(end_line, end_line + 1)[:1]
+            text = text.lower()
+            grams = set(text)
+            grams.update(map(operator.add, text, text[1:]))
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array(typecode)
+                posting.append(block)
+            line = end_line
+
+        block_lines.append(total)
+        return cls(document, block_lines, postings, typecode)
+
+    @classmethod
+    def load(cls, document):
+        """从文件缓存读取索引，缓存不存在或版本不符时返回 None"""
+        raw = document.cache.load_bytes(cls.CACHE_NAME)
+        if raw is None:
+            return None
+        try:
+            data = marshal.loads(raw)
+        except (EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != cls.VERSION:
+            return None
+        block_lines = array('Q')
+        block_lines.frombytes(data['blocks'])
+        return cls(document, block_lines, data['postings'], data['typecode'])
+
+    def save(self):
+        """写入文件缓存"""
+        data = {
+            'version': self.VERSION,
+            'typecode': self.typecode,
+            'blocks': self.block_lines.tobytes(),
+            'postings': {gram: self._posting(gram).tobytes() for gram in self.postings},
+        }
+        self.document.cache.save_bytes(self.CACHE_NAME, marshal.dumps(data))
+
+    def memory_size(self):
+        """估算索引占用的内存字节数"""
+        size = self.block_lines.itemsize * len(self.block_lines)
+        for posting in self.postings.values():
+            size += len(posting) if isinstance(posting, bytes) else posting.itemsize * len(posting)
+        # 每个单字或二元组的键、字典项和数组对象本身
+        return size + len(self.postings) * 150
+
+    def _posting(self, gram):
+        posting = self.postings.get(gram)
+        if isinstance(posting, bytes):
+            posting = self.postings[gram] = array(self.typecode, posting)
+        return posting
+
+    def _candidate_blocks(self, query):
+        """返回可能包含查询串的块号"""
+        grams = set(map(operator.add, query, query[1:])) or {query}
+        postings = []
+        for gram in grams:
+            posting = self._posting(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        soft_blocks = self._soft_block_set() if len(grams) > 1 else ()
+        candidates = None
+        for posting in postings:
+            blocks = set(posting)
+            if soft_blocks:
+                # 命中可能从前一块开始，跨过软换行处的边界延续到这一块
+                blocks.update(block - 1 for block in soft_blocks.intersection(posting))
+            candidates = blocks if candidates is None else candidates & blocks
+            if not candidates:
+                break
+        return sorted(candidates)
+
+    def _soft_block_set(self):
+        if self._soft_blocks is None:
+            document = self.document
+            self._soft_blocks = {block for block in range(1, len(self.block_lines) - 1)
+                                 if is_soft_line(document, self.block_lines[block])}
+        return self._soft_blocks
+
+    def search(self, query, limit=500):
+        """查找查询串，返回 [(字节偏移, 所在行片段), ...]，最多 limit 条"""
+        query = query.lower()
+        if not query:
+            return []
+
+        document = self.document
+        hits = []
+        for block in self._candidate_blocks(query):
+            end_line = self.block_lines[block + 1]
+            text, starts, lines = decode_block(document, self.block_lines[block], end_line)
+            # 只接受从这一块开始的命中，块边界在软换行处时接上后一块开头的几个字
+            block_length = len(text)
+            if end_line < document.line_count() and is_soft_line(document, end_line):
+                text += document.get_text(end_line, end_line + 1)[:len(query) - 1]
+            lowered = text.lower()
+            pos = lowered.find(query)
+            piece = -1
+            while pos != -1 and pos < block_length:
+                # 命中位置所在的段，段内按换行符计数得到行号
+                current = bisect_right(starts, pos) - 1
+                if current != piece:
+                    piece, line, counted = current, lines[current], starts[current]
+                line += lowered.count('\n', counted, pos)
+                counted = pos
+                line_start = max(starts[piece], lowered.rfind('\n', 0, pos) + 1)
+                prefix = text[line_start:pos]
+                offset = document.offset_of_line(line) + len(prefix.encode(document.encoding))
+                # 片段按原文的行截取，可以跨过软换行
+                snippet_start = lowered.rfind('\n', 0, pos) + 1
+                snippet_end = lowered.find('\n', pos)
+                if snippet_end == -1:
+                    snippet_end = len(text)
+                snippet = text[max(snippet_start, pos - 10):min(snippet_end, pos + len(query) + 30)]
+                hits.append((offset, snippet))
+                if len(hits) >= limit:
+                    return hits
+                pos = lowered.find(query, pos + len(query))
+        return hits
+
+
+def load_search_index(document, cancelled=None):
+    """读取缓存的搜索索引，没有缓存时建立并写入缓存"""
+    index = SearchIndex.load(document)
+    if index is None:
+        index = SearchIndex.build(document, cancelled)
+        if index is not None:
+            index.save()
+    return index
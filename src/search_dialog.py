@@ -0,0 +1,47 @@
+import time
+
+from PySide6.QtWidgets import QListWidgetItem
+from PySide6.QtCore import Qt
+
+from src.ui.search_ui import SearchDialogUI
+
+class SearchDialog(SearchDialogUI):
+    # 最多显示的结果数
+    RESULT_LIMIT = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        # 连接信号和槽
+        self.queryEdit.returnPressed.connect(self.search)
+        self.searchBtn.clicked.connect(self.search)
+        self.resultList.itemActivated.connect(self.jump_to_result)
+
+    def search(self):
+        """使用当前文档的搜索索引查找"""
+        self.resultList.clear()
+        query = self.queryEdit.text()
+        if not query:
+            self.statusLabel.setText("")
+            return
+
+        index = self.parent.search_index
+        if index is None:
+            self.statusLabel.setText("正在建立搜索索引，请稍候再试")
+            return
+
+        start = time.perf_counter()
+        hits = index.search(query, self.RESULT_LIMIT)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        for offset, snippet in hits:
+            item = QListWidgetItem(snippet)
+            item.setData(Qt.ItemDataRole.UserRole, offset)
+            self.resultList.addItem(item)
+
+        more = "+" if len(hits) >= self.RESULT_LIMIT else ""
+        self.statusLabel.setText(f"找到 {len(hits)}{more} 处（{elapsed:.1f} ms）")
+
+    def jump_to_result(self, item):
+        """跳转到选中的结果"""
+        self.parent.jump_to_offset(item.data(Qt.ItemDataRole.UserRole))
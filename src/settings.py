@@ -1,13 +1,15 @@
-from PySide6.QtWidgets import QFileDialog, QColorDialog
-from PySide6.QtCore import QSettings
+import re
+
+from PySide6.QtWidgets import QFileDialog, QColorDialog, QCheckBox, QMessageBox
 from PySide6.QtGui import QColor
 
+from src.cleanup import RULES
 from src.ui.settings_ui import SettingsDialogUI
 
 class SettingsDialog(SettingsDialogUI):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.settings = QSettings("StealthReader", "Settings")
+        self.settings = parent.settings
         
         # 设置初始值
         self.filePathLabel.setText(parent.file_path if parent.file_path else "未选择文件")
@@ -15,6 +17,24 @@ class SettingsDialog(SettingsDialogUI):
         self.bgAlphaSlider.setValue(parent.bg_alpha)
         self.textColorBtn.setStyleSheet(f"background-color: {parent.text_color.name()}")
         self.textAlphaSlider.setValue(parent.text_alpha)
+        self.profilingCheck.setChecked(parent.profiling)
+        self.hotkeyEdits = {
+            "boss": self.bossKeyEdit,
+            "page_up": self.pageUpKeyEdit,
+            "page_down": self.pageDownKeyEdit,
+        }
+        for action, edit in self.hotkeyEdits.items():
+            edit.setText(parent.hotkeys.get(action, ""))
+        self.cleanupChecks = {}
+        for i, (name, (label, _)) in enumerate(RULES.items()):
+            check = QCheckBox(label)
+            check.setChecked(name in parent.cleanup_rules)
+            self.cleanupLayout.addWidget(check, i // 2, i % 2)
+            self.cleanupChecks[name] = check
+        self.adPatternEdit.setText(parent.cleanup_ad_patterns[0] if parent.cleanup_ad_patterns else "")
+        self.scrollSpeedSlider.setRange(parent.text_edit.AUTO_SCROLL_MIN_SPEED, parent.text_edit.AUTO_SCROLL_MAX_SPEED)
+        self.scrollSpeedSlider.setValue(round(parent.scroll_speed))
+        self.trimDelaySpin.setValue(parent.trim_delay)
         
         # 连接信号和槽
         self.fileChooseBtn.clicked.connect(self.choose_file)
@@ -41,7 +61,7 @@ class SettingsDialog(SettingsDialogUI):
         """选择要显示的文本文件"""
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择文本文件", "", "文本文件 (*.txt);;所有文件 (*)", options=options
+            self, "选择文本文件", "", self.parent.FILE_FILTER, options=options
         )
         
         if file_path:
@@ -71,11 +91,18 @@ class SettingsDialog(SettingsDialogUI):
         self.parent.bg_alpha = self.bgAlphaSlider.value()
         self.parent.text_alpha = self.textAlphaSlider.value()
         
-        # 更新主窗口样式
-        self.parent.update_styles()
+        # 更新主窗口样式（合并到下一帧）
+        self.parent.request_style_update()
     
     def save_settings(self):
         """保存设置到配置文件"""
+        ad_pattern = self.adPatternEdit.text().strip()
+        try:
+            re.compile(ad_pattern)
+        except re.error as e:
+            QMessageBox.warning(self, "广告关键词", f"正则表达式无效: {e}")
+            return
+        
         # 将临时文件路径保存到父窗口
         self.parent.file_path = self.temp_file_path
         
@@ -85,6 +112,25 @@ class SettingsDialog(SettingsDialogUI):
         self.settings.setValue("text_color", self.parent.text_color.name())
         self.settings.setValue("text_alpha", self.parent.text_alpha)
         self.settings.setValue("file_path", self.parent.file_path)
+        self.settings.setValue("profiling", self.profilingCheck.isChecked())
+        self.parent.set_profiling(self.profilingCheck.isChecked())
+        
+        self.parent.set_scroll_speed(self.scrollSpeedSlider.value())
+        self.parent.trim_delay = self.trimDelaySpin.value()
+        self.settings.setValue("trim_delay", self.parent.trim_delay)
+        
+        # 快捷键有变化时重新注册
+        hotkeys = {action: edit.text().strip().lower() for action, edit in self.hotkeyEdits.items()}
+        for action, combo in hotkeys.items():
+            self.settings.setValue(f"hotkey_{action}", combo)
+        if hotkeys != self.parent.hotkeys:
+            self.parent.set_hotkeys(hotkeys)
+        
+        # 清理规则变化时按新规则重新打开当前文档
+        rules = [name for name, check in self.cleanupChecks.items() if check.isChecked()]
+        self.settings.setValue("cleanup_rules", ",".join(rules))
+        self.settings.setValue("cleanup_ad_pattern", ad_pattern)
+        self.parent.set_cleanup(rules, (ad_pattern,) if ad_pattern else ())
         
         self.accept()
     
@@ -96,13 +142,15 @@ class SettingsDialog(SettingsDialogUI):
         self.parent.text_color = self.original_settings['text_color']
         self.parent.text_alpha = self.original_settings['text_alpha']
         
-        # 如果文件路径已更改，则恢复原始文件
+        # 如果文件路径已更改，则切换回原始文件（原始文件仍在文档缓存中，不会重新读取）
         if self.temp_file_path != self.original_settings['file_path']:
             self.parent.file_path = self.original_settings['file_path']
+            document = self.parent.document
             if self.parent.file_path:
-                self.parent.load_file(self.parent.file_path)
+                if document is None or document.file_path != self.parent.file_path:
+                    self.parent.load_file(self.parent.file_path)
             else:
-                self.parent.text_edit.setText("这是一个示例文本，窗口是半透明的，文本是只读的。")
+                self.parent.close_document()
         
         # 更新主窗口样式
         self.parent.update_styles()
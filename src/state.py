@@ -0,0 +1,164 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, QTimer
+
+
+def state_root():
+    """返回保存阅读状态和设置的目录"""
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(base, 'StealthReader')
+
+
+class StateStore(QObject):
+    """阅读状态和设置的存储，接口与 QSettings 的 value/setValue 相同
+
+    启动时一次读入快照文件并重放日志，之后所有读取都在内存中完成。
+    setValue 只更新内存并记下改动，改动每隔 FLUSH_INTERVAL 毫秒批量追加到日志文件，
+    写入和 fsync 在后台线程中进行，因此崩溃或强制结束最多丢失约一秒的改动。
+    日志超过 COMPACT_SIZE 字节或关闭时，把全部状态写成新的快照并清空日志。
+    """
+
+    # 批量写入日志的间隔（毫秒）
+    FLUSH_INTERVAL = 1000
+    # 日志超过这个大小（字节）时合并为快照
+    COMPACT_SIZE = 256 * 1024
+
+    SNAPSHOT = 'state.json'
+    JOURNAL = 'state.journal'
+
+    def __init__(self, directory=None, legacy=None, parent=None):
+        super().__init__(parent)
+        self.directory = directory or state_root()
+        self._values = {}
+        self._pending = {}
+        self._journal_size = 0
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.FLUSH_INTERVAL)
+        self._timer.timeout.connect(self.flush)
+        if not self._load() and legacy is not None:
+            # 第一次运行：导入原来保存在 QSettings 中的设置
+            for key in legacy.allKeys():
+                self.setValue(key, legacy.value(key))
+        if self._journal_size:
+            # 上次没有正常关闭，日志末尾可能有不完整的记录，先合并为快照再继续追加
+            self._journal_size = 0
+            self._executor.submit(self._write_snapshot, json.dumps(self._values, ensure_ascii=False))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        """读入快照并重放日志，返回是否存在已保存的状态"""
+        found = False
+        try:
+            with open(self._path(self.SNAPSHOT), 'rb') as file:
+                self._values = json.loads(file.read().decode('utf-8'))
+            found = True
+        except (OSError, ValueError):
+            self._values = {}
+        try:
+            with open(self._path(self.JOURNAL), 'rb') as file:
+                data = file.read()
+        except OSError:
+            return found
+        self._journal_size = len(data)
+        for line in data.splitlines():
+            try:
+                self._values.update(json.loads(line.decode('utf-8')))
+            except ValueError:
+                # 写到一半时崩溃留下的不完整记录
+                break
+        return True
+
+    def value(self, key, default=None, type=None):
+        """读取设置，type 为 bool/int/float 时转换类型"""
+        value = self._values.get(key, default)
+        if type is bool and isinstance(value, str):
+            return value.lower() in ('true', '1')
+        if type is not None and value is not None:
+            return type(value)
+        return value
+
+    def setValue(self, key, value):
+        if self._values.get(key) == value and key in self._values:
+            return
+        self._values[key] = value
+        self._pending[key] = value
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def contains(self, key):
+        return key in self._values
+
+    def allKeys(self):
+        return list(self._values)
+
+    def flush(self):
+        """把尚未写入的改动交给后台线程追加到日志"""
+        self._timer.stop()
+        if not self._pending:
+            return
+        record = (json.dumps(self._pending, ensure_ascii=False) + '\n').encode('utf-8')
+        self._pending = {}
+        if self._closed:
+            # 关闭之后的改动直接写入
+            self._append(record)
+            return
+        self._journal_size += len(record)
+        if self._journal_size > self.COMPACT_SIZE:
+            self._journal_size = 0
+            self._executor.submit(self._write_snapshot, json.dumps(self._values, ensure_ascii=False))
+        else:
+            self._executor.submit(self._append, record)
+
+    def sync(self):
+        """立即写入所有改动并等待写入完成"""
+        self.flush()
+        if not self._closed:
+            self._executor.submit(lambda: None).result()
+
+    def close(self):
+        """写入完整快照并停止后台线程"""
+        if self._closed:
+            self.flush()
+            return
+        self._closed = True
+        self._timer.stop()
+        self._pending = {}
+        self._journal_size = 0
+        self._executor.submit(self._write_snapshot, json.dumps(self._values, ensure_ascii=False))
+        self._executor.shutdown(wait=True)
+
+    def _append(self, record):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(self.JOURNAL), 'ab') as file:
+                file.write(record)
+                file.flush()
+                os.fsync(file.fileno())
+        except OSError:
+            pass
+
+    def _write_snapshot(self, data):
+        """原子地替换快照，然后清空日志（快照已经包含日志中的全部改动）"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self._path(self.SNAPSHOT + '.tmp')
+            with open(temp_path, 'wb') as file:
+                file.write(data.encode('utf-8'))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self._path(self.SNAPSHOT))
+            with open(self._path(self.JOURNAL), 'wb'):
+                pass
+        except OSError:
+            pass
@@ -1,13 +1,546 @@
-from PySide6.QtWidgets import QTextEdit
-from PySide6.QtCore import Qt
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from PySide6.QtWidgets import QAbstractScrollArea, QWidget
+from PySide6.QtCore import Qt, QPointF, QTimer, Signal
+from PySide6.QtGui import QPainter, QColor, QPalette, QTextLayout, QTextOption
+
+from src.pagination import Paginator
+
+class BackgroundWidget(QWidget):
+    """自绘半透明圆角背景的窗口部件，修改颜色只需重绘，不需要重新应用样式表"""
+
+    RADIUS = 5
+
+    # 第一次绘制完成
+    first_painted = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._background = QColor(0, 0, 0, 0)
+        self._painted = False
+
+    def set_background(self, color):
+        if color != self._background:
+            self._background = color
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(self._background)
+        painter.drawRoundedRect(self.rect(), self.RADIUS, self.RADIUS)
+        if not self._painted:
+            self._painted = True
+            self.first_painted.emit()
+
+class TextView(QAbstractScrollArea):
+    """只读的文本视图，只排版和绘制视口中可见的行
+
+    阅读位置由视口顶部的行号和该行内的像素偏移表示，滚动条按行定位。
+    每行排版后的 QTextLayout 按 (行首偏移, 行尾偏移) 缓存，其中保存了整形后的字形，
+    重绘时直接绘制；只有宽度或字体变化时才重新排版，并且只排版可见的几行。
+    鼠标按键和移动事件不处理，交给主窗口用于拖动和调整大小。
+    """
+
+    # 第一屏显示前至少索引的行数，也是空闲时预先计算行高的行数
+    WINDOW_LINES = 600
+    # 文本与视口边缘的距离（像素）
+    MARGIN = 4
+    # 缓存排版结果的行数
+    LAYOUT_CACHE_LINES = 400
+    # 滚轮每一格滚动的行数
+    WHEEL_LINES = 3
+    # 尺寸稳定多久后开始在空闲时计算分页（毫秒）
+    IDLE_LAYOUT_DELAY = 200
+    # 空闲时每次计算的行数
+    IDLE_LAYOUT_BATCH = 50
+    # 自动滚动速度范围（像素/秒），以及方向键每次调整的比例
+    AUTO_SCROLL_MIN_SPEED = 5
+    AUTO_SCROLL_MAX_SPEED = 600
+    AUTO_SCROLL_SPEED_STEP = 1.2
+
+    # 自动滚动停止（到达末尾等），以及速度被方向键调整
+    auto_scroll_stopped = Signal()
+    auto_scroll_speed_changed = Signal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        # 当前显示的文档；没有文档时显示 _message
+        self.source = None
+        self._message = ""
+        # 视口顶部的行，以及该行顶部到视口顶部的像素距离
+        self._top_line = 0
+        self._top_inside = 0.0
+        # 排版缓存：{(行首偏移, 行尾偏移): (QTextLayout, 行高)}，宽度或字体变化时清空
+        self._layouts = OrderedDict()
+        self._layout_key = None
+        # 跟随模式下停在末尾，追加内容后继续停在末尾
+        self._stick_to_end = False
+        # 释放排版后保留的阅读位置（字节偏移），为空表示没有释放
+        self._released = None
+        self._syncing = False
+        self.verticalScrollBar().valueChanged.connect(self._on_scroll_bar)
+
+        # 分页计算，拖动调整大小期间暂停空闲时的预先计算
+        self.paginator = Paginator()
+        self._live_resize = False
+        self._idle_line = 0
+        self._idle_end = 0
+        self._idle_timer = QTimer(self)
+        self._idle_timer.timeout.connect(self._layout_idle)
+
+        # 自动滚动：按屏幕刷新率触发，每帧按经过的时间滚动若干像素，不足一像素的部分累积到下一帧
+        self.auto_scroll_speed = 30.0
+        self._auto_scroll = False
+        self._scroll_remainder = 0.0
+        self._last_frame = None
+        self._scroll_timer = QTimer(self)
+        self._scroll_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._scroll_timer.timeout.connect(self._auto_scroll_frame)
+
+        # 性能记录，由主窗口设置
+        self.profiler = None
+
+    def _measure(self, name):
+        """记录一段代码的耗时（未启用性能记录时不做任何事）"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.measure(name)
+
+    def _line_count(self):
+        return self.source.line_count() if self.source is not None else 0
+
+    def _page_metrics(self):
+        """返回排版宽度、页面高度和字体"""
+        width = max(1, self.viewport().width() - 2 * self.MARGIN)
+        height = self.viewport().height() - 2 * self.MARGIN
+        return width, height, self.font()
+
+    def _make_layout(self, text, width):
+        """折行排版一段文本，返回 (QTextLayout, 高度)"""
+        layout = QTextLayout(text, self.font())
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(option)
+        # 保留整形结果，重绘时不再重新生成字形
+        layout.setCacheEnabled(True)
+        layout.beginLayout()
+        height = 0.0
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(width)
+            line.setPosition(QPointF(0, height))
+            height += line.height()
+        layout.endLayout()
+        return layout, height
+
+    def _line_layout(self, line):
+        """返回某一行的 (QTextLayout, 行高)，优先使用缓存"""
+        width, _, font = self._page_metrics()
+        key = (width, font.key())
+        if key != self._layout_key:
+            self._layouts.clear()
+            self._layout_key = key
+        offsets = self.source.line_offsets
+        span = (offsets[line], offsets[line + 1] if line + 1 < len(offsets) else self.source.size)
+        cached = self._layouts.get(span)
+        if cached is not None:
+            self._layouts.move_to_end(span)
+            return cached
+        with self._measure("decode"):
+            text = self.source.get_text(line, line + 1)
+        with self._measure("layout"):
+            cached = self._layouts[span] = self._make_layout(text, width)
+        while len(self._layouts) > self.LAYOUT_CACHE_LINES:
+            self._layouts.popitem(last=False)
+        # 分页直接使用排版得到的行高
+        self.paginator.set_line_height(self.source, line, width, font, cached[1])
+        return cached
+
+    def _line_height(self, line):
+        return self._line_layout(line)[1]
+
+    def paintEvent(self, event):
+        with self._measure("paint"):
+            painter = QPainter(self.viewport())
+            painter.setPen(self.palette().color(QPalette.ColorRole.Text))
+            rect = event.rect()
+            height = self.viewport().height()
+            if self.source is None:
+                y = self.MARGIN
+                width = self._page_metrics()[0]
+                for text in self._message.split('\n'):
+                    layout, line_height = self._make_layout(text, width)
+                    layout.draw(painter, QPointF(self.MARGIN, y))
+                    y += line_height
+                return
+            if self._released is not None:
+                return
+            count = self._line_count()
+            line, y = self._top_line, self.MARGIN - self._top_inside
+            while line < count and y < height:
+                layout, line_height = self._line_layout(line)
+                if y + line_height >= rect.top() and y <= rect.bottom():
+                    layout.draw(painter, QPointF(self.MARGIN, y))
+                y += line_height
+                line += 1
 
-class CustomTextEdit(QTextEdit):
     def mousePressEvent(self, event):
-        # 禁止鼠标事件传递给文本编辑器
+        # 鼠标事件交给主窗口处理（拖动和调整大小）
         event.ignore()
-    
+
     def mouseMoveEvent(self, event):
         event.ignore()
-    
+
     def mouseReleaseEvent(self, event):
-        event.ignore() 
\ No newline at end of file
+        event.ignore()
+
+    def mouseDoubleClickEvent(self, event):
+        event.ignore()
+
+    def wheelEvent(self, event):
+        if self.source is None:
+            event.ignore()
+            return
+        delta = event.pixelDelta().y()
+        if not delta:
+            delta = event.angleDelta().y() / 120 * self.WHEEL_LINES * self.fontMetrics().lineSpacing()
+        self._stick_to_end = False
+        self.scroll_by(-delta)
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key in (Qt.Key.Key_PageDown, Qt.Key.Key_Space):
+            self.page_down()
+        elif key == Qt.Key.Key_PageUp:
+            self.page_up()
+        elif self._auto_scroll and key in (Qt.Key.Key_Up, Qt.Key.Key_Down):
+            # 自动滚动时方向键调整速度
+            step = self.AUTO_SCROLL_SPEED_STEP
+            self.set_auto_scroll_speed(self.auto_scroll_speed * (step if key == Qt.Key.Key_Down else 1 / step))
+            self.auto_scroll_speed_changed.emit(self.auto_scroll_speed)
+        elif key in (Qt.Key.Key_Up, Qt.Key.Key_Down):
+            spacing = self.fontMetrics().lineSpacing()
+            self._stick_to_end = False
+            self.scroll_by(spacing if key == Qt.Key.Key_Down else -spacing)
+        elif key == Qt.Key.Key_Home:
+            self.scroll_to_line(0)
+        elif key == Qt.Key.Key_End:
+            self.scroll_to_line(max(0, self._line_count() - 1))
+        else:
+            super().keyPressEvent(event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.source is not None and self._released is None:
+            # 宽度变化后只有可见的几行在绘制时重新排版
+            self._clamp_to_end()
+            self._sync_scroll_bar()
+        self._schedule_idle_layout()
+
+    def set_text(self, text):
+        """不显示文档，只显示一段说明文字"""
+        self.set_source(None)
+        self._message = text
+        self.viewport().update()
+
+    def set_source(self, source, offset=0):
+        """显示文档，从指定字节偏移所在的行开始"""
+        inside = 0.0
+        if source is not None and getattr(self.source, 'document', None) is source:
+            # 从局部索引切换到完整文档：行偏移相同，保留排版缓存和顶部行内的位置
+            if self._released is None and offset == self.current_offset():
+                inside = self._top_inside
+        else:
+            self._layouts.clear()
+        self.source = source
+        self._stick_to_end = False
+        self._top_line, self._top_inside = 0, 0.0
+        if self._released is not None and source is not None:
+            # 已经释放时只记下位置，显示时再恢复
+            self._released = offset
+            return
+        self._released = None
+        if source is not None:
+            self._set_top(source.line_at_offset(offset), inside)
+            self._schedule_idle_layout()
+        else:
+            self._sync_scroll_bar()
+            self.viewport().update()
+
+    def source_extended(self):
+        """文档的行索引增长后，更新滚动范围并补画尚未填满的视口"""
+        if self.source is None or self._released is not None:
+            return
+        self._sync_scroll_bar()
+        self.viewport().update()
+
+    def source_appended(self, previous_count):
+        """文档末尾追加了行（跟随模式）
+
+        原来的最后一行可能尚未写完，按新的行尾偏移重新排版；
+        视口原本停在末尾时继续停在末尾。
+        """
+        if self.source is None or self._released is not None:
+            return
+        _, height, _ = self._page_metrics()
+        if not self._stick_to_end:
+            self._stick_to_end = self._remaining_height(previous_count, height) <= height + 0.5
+        if self._stick_to_end:
+            self._scroll_to_end()
+        else:
+            self._sync_scroll_bar()
+            self.viewport().update()
+
+    def top_line(self):
+        """返回视口顶部的行号"""
+        if self._released is not None:
+            return self.source.line_at_offset(self._released)
+        return self._top_line
+
+    def current_offset(self):
+        """返回视口顶部所在行的字节偏移"""
+        if self.source is None:
+            return 0
+        return self.source.offset_of_line(min(self.top_line(), self.source.line_count() - 1))
+
+    def scroll_to_offset(self, offset):
+        """滚动到指定字节偏移所在的行"""
+        if self.source is not None:
+            self.scroll_to_line(self.source.line_at_offset(offset))
+
+    def scroll_to_line(self, line):
+        """将指定行滚动到视口顶部"""
+        if self.source is None:
+            return
+        self._stick_to_end = False
+        self._set_top(line, 0.0)
+
+    def scroll_by(self, pixels):
+        """按像素滚动，返回位置是否发生变化"""
+        count = self._line_count()
+        if not count or self._released is not None:
+            return False
+        before = (self._top_line, self._top_inside)
+        line, inside = self._top_line, self._top_inside + pixels
+        while inside < 0 and line > 0:
+            line -= 1
+            inside += self._line_height(line)
+        inside = max(0.0, inside)
+        while line < count - 1:
+            height = self._line_height(line)
+            if inside < height:
+                break
+            inside -= height
+            line += 1
+        self._top_line, self._top_inside = line, inside
+        self._clamp_to_end()
+        if (self._top_line, self._top_inside) == before:
+            return False
+        self._sync_scroll_bar()
+        self.viewport().update()
+        return True
+
+    def _set_top(self, line, inside):
+        count = self._line_count()
+        self._top_line = max(0, min(line, count - 1))
+        self._top_inside = inside
+        self._clamp_to_end()
+        self._sync_scroll_bar()
+        self.viewport().update()
+
+    def _scroll_to_end(self):
+        """滚动到最后一行的底部与视口底部对齐"""
+        count = self._line_count()
+        if count:
+            self._top_line = count - 1
+            self._top_inside = self._line_height(count - 1)
+        self._clamp_to_end()
+        self._sync_scroll_bar()
+        self.viewport().update()
+
+    def _remaining_height(self, count, limit):
+        """视口顶部到第 count 行之前的内容高度，超过 limit 后不再累计"""
+        remaining, line = -self._top_inside, self._top_line
+        while line < count and remaining <= limit:
+            remaining += self._line_height(line)
+            line += 1
+        return remaining
+
+    def _clamp_to_end(self):
+        """不滚动到文档末尾之后：最后一行的底部不高于视口底部"""
+        count = self._line_count()
+        if not count:
+            self._top_line, self._top_inside = 0, 0.0
+            return
+        _, height, _ = self._page_metrics()
+        remaining = self._remaining_height(count, height)
+        if remaining >= height:
+            return
+        inside = self._top_inside - (height - remaining)
+        while inside < 0 and self._top_line > 0:
+            self._top_line -= 1
+            inside += self._line_height(self._top_line)
+        self._top_inside = max(0.0, inside)
+
+    def _at_end(self):
+        _, height, _ = self._page_metrics()
+        return self._remaining_height(self._line_count(), height) <= height + 0.5
+
+    def _sync_scroll_bar(self):
+        """滚动条按行定位：范围是行数，值是视口顶部的行"""
+        bar = self.verticalScrollBar()
+        self._syncing = True
+        try:
+            bar.setRange(0, max(0, self._line_count() - 1))
+            bar.setPageStep(max(1, self.viewport().height() // max(1, self.fontMetrics().lineSpacing())))
+            bar.setValue(self._top_line)
+        finally:
+            self._syncing = False
+
+    def _on_scroll_bar(self, value):
+        """拖动滚动条时跳到对应的行"""
+        if self._syncing or self.source is None or self._released is not None:
+            return
+        if value != self._top_line:
+            self._stick_to_end = False
+            self._set_top(value, 0.0)
+
+    def page_down(self):
+        """向后翻一页，以整行为单位；顶部的行比一页还高时在行内按像素翻页"""
+        if self.source is None or self.source.line_count() == 0 or self._released is not None:
+            return
+        width, height, font = self._page_metrics()
+        if self._line_height(self._top_line) - self._top_inside > height:
+            self._scroll_page(1)
+            return
+        with self._measure("paginate"):
+            line = self.paginator.next_page(self.source, self.top_line(), width, height, font)
+        self.scroll_to_line(line)
+
+    def page_up(self):
+        """向前翻一页，以整行为单位；停在行内或上一行比一页还高时按像素翻页"""
+        if self.source is None or self.source.line_count() == 0 or self._released is not None:
+            return
+        width, height, font = self._page_metrics()
+        if self._top_inside > 0 or (self._top_line > 0 and self._line_height(self._top_line - 1) > height):
+            self._scroll_page(-1)
+            return
+        with self._measure("paginate"):
+            line = self.paginator.previous_page(self.source, self.top_line(), width, height, font)
+        self.scroll_to_line(line)
+
+    def _scroll_page(self, direction):
+        """按像素翻一页，保留一行作为上下文"""
+        _, height, _ = self._page_metrics()
+        self._stick_to_end = False
+        self.scroll_by(direction * max(1, height - self.fontMetrics().lineSpacing()))
+
+    def begin_live_resize(self):
+        """开始拖动调整大小：暂停空闲时的分页计算，每次尺寸变化只重新排版可见的几行"""
+        self._live_resize = True
+        self._idle_timer.stop()
+
+    def end_live_resize(self):
+        """结束拖动调整大小，在空闲时补算分页"""
+        if not self._live_resize:
+            return
+        self._live_resize = False
+        self._schedule_idle_layout()
+
+    def _schedule_idle_layout(self):
+        """尺寸稳定后从视口顶部开始在空闲时计算行高"""
+        if self.source is None or self._live_resize or self._released is not None:
+            return
+        self._idle_line = self.top_line()
+        self._idle_end = min(self.source.line_count(), self._idle_line + self.WINDOW_LINES)
+        self._idle_timer.start(self.IDLE_LAYOUT_DELAY)
+
+    def _layout_idle(self):
+        """每次计算一批行高，算完视口之后的 WINDOW_LINES 行后停止"""
+        if self.source is None or self._live_resize:
+            self._idle_timer.stop()
+            return
+        width, height, font = self._page_metrics()
+        end = min(self._idle_end, self.source.line_count(), self._idle_line + self.IDLE_LAYOUT_BATCH)
+        for line in range(self._idle_line, end):
+            self.paginator.line_height(self.source, line, width, font)
+        self._idle_line = end
+        if end >= self._idle_end:
+            self._idle_timer.stop()
+        else:
+            self._idle_timer.start(0)
+
+    def release(self):
+        """释放排版缓存，只保留阅读位置，再次显示时恢复"""
+        if self.source is None or self._released is not None:
+            return
+        offset = self.current_offset()
+        self._idle_timer.stop()
+        self._layouts.clear()
+        self._top_line, self._top_inside = 0, 0.0
+        self._released = offset
+
+    def restore(self):
+        """恢复释放的阅读位置，可见的几行在绘制时重新排版"""
+        if self._released is None:
+            return
+        line = self.source.line_at_offset(self._released)
+        self._released = None
+        self._set_top(line, 0.0)
+
+    def set_auto_scroll(self, enabled):
+        """开启或停止自动滚动"""
+        self._auto_scroll = enabled
+        self._scroll_remainder = 0.0
+        if enabled and self.isVisible():
+            self._start_frames()
+        else:
+            self._scroll_timer.stop()
+
+    def set_auto_scroll_speed(self, speed):
+        """设置自动滚动速度（像素/秒）"""
+        self.auto_scroll_speed = max(self.AUTO_SCROLL_MIN_SPEED, min(float(speed), self.AUTO_SCROLL_MAX_SPEED))
+
+    def _start_frames(self):
+        """按屏幕刷新率启动逐帧滚动"""
+        screen = self.screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        self._scroll_timer.start(max(1, round(1000 / (rate if rate > 0 else 60))))
+        self._last_frame = time.perf_counter()
+
+    def _auto_scroll_frame(self):
+        """按上一帧以来经过的时间滚动整数像素"""
+        now = time.perf_counter()
+        # 卡顿（如拖动窗口）之后不一次跳过一大段
+        elapsed = min(now - self._last_frame, 0.1)
+        self._last_frame = now
+        if self.source is None or self._live_resize:
+            return
+        self._scroll_remainder += self.auto_scroll_speed * elapsed
+        pixels = int(self._scroll_remainder)
+        if not pixels:
+            return
+        self._scroll_remainder -= pixels
+        if not self.scroll_by(pixels) and self.source.complete and self._at_end():
+            self.set_auto_scroll(False)
+            self.auto_scroll_stopped.emit()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.restore()
+        if self._auto_scroll:
+            self._start_frames()
+        self._schedule_idle_layout()
+
+    def hideEvent(self, event):
+        # 隐藏后停止所有定时器，不在后台占用 CPU
+        super().hideEvent(event)
+        self._scroll_timer.stop()
+        self._idle_timer.stop()
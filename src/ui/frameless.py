@@ -0,0 +1,203 @@
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt, QObject, QRect, QTimer, Signal
+from PySide6.QtGui import QCursor
+
+class FramelessController(QObject):
+    """无边框窗口的边缘命中测试、鼠标指针以及拖动和调整大小
+
+    鼠标指针只在命中区域变化时修改，覆盖指针栈的深度始终不超过一层；
+    拖动和调整大小时只记录目标几何信息，按屏幕刷新率合并后再应用到窗口。
+    counters 记录处理的事件数和实际生效的操作数。
+    """
+
+    resize_started = Signal()
+    resize_finished = Signal()
+
+    def __init__(self, window, margins, min_width, min_height):
+        super().__init__(window)
+        self.window = window
+        self.margins = margins
+        self.min_width = min_width
+        self.min_height = min_height
+
+        # 预定义鼠标指针
+        self._cursors = {
+            "topleft": QCursor(Qt.CursorShape.SizeFDiagCursor),
+            "bottomright": QCursor(Qt.CursorShape.SizeFDiagCursor),
+            "topright": QCursor(Qt.CursorShape.SizeBDiagCursor),
+            "bottomleft": QCursor(Qt.CursorShape.SizeBDiagCursor),
+            "left": QCursor(Qt.CursorShape.SizeHorCursor),
+            "right": QCursor(Qt.CursorShape.SizeHorCursor),
+            "top": QCursor(Qt.CursorShape.SizeVerCursor),
+            "bottom": QCursor(Qt.CursorShape.SizeVerCursor),
+            "default": QCursor(Qt.CursorShape.ArrowCursor)
+        }
+        # 当前覆盖指针对应的区域，None 表示没有覆盖指针
+        self._cursor_region = None
+
+        # 当前操作：None、"move" 或 "resize"
+        self._mode = None
+        self._direction = None
+        self._initial_rect = None
+        self._initial_pos = None
+
+        # 等待应用的几何信息，由定时器按帧应用
+        self._pending_rect = None
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._on_frame)
+
+        self.counters = {
+            "events": 0,
+            "cursor_changes": 0,
+            "geometry_requests": 0,
+            "geometry_applied": 0,
+        }
+
+    def hit_test(self, x, y, width, height):
+        """确定调整方向，不在边缘时返回 None"""
+        left = x <= self.margins
+        right = x >= width - self.margins
+        top = y <= self.margins
+        bottom = y >= height - self.margins
+
+        if left and top:
+            return "topleft"
+        elif left and bottom:
+            return "bottomleft"
+        elif right and top:
+            return "topright"
+        elif right and bottom:
+            return "bottomright"
+        elif left:
+            return "left"
+        elif right:
+            return "right"
+        elif top:
+            return "top"
+        elif bottom:
+            return "bottom"
+        return None
+
+    def _hit_test_event(self, event):
+        pos = event.position()
+        return self.hit_test(pos.x(), pos.y(), self.window.width(), self.window.height())
+
+    def _set_cursor_region(self, region):
+        """切换鼠标指针，区域没有变化时不做任何事"""
+        if region == self._cursor_region:
+            return
+        self.counters["cursor_changes"] += 1
+        if region is None:
+            QApplication.restoreOverrideCursor()
+        elif self._cursor_region is None:
+            QApplication.setOverrideCursor(self._cursors[region])
+        else:
+            QApplication.changeOverrideCursor(self._cursors[region])
+        self._cursor_region = region
+
+    def press(self, event):
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        self._initial_rect = self.window.geometry()
+        self._initial_pos = event.globalPosition().toPoint()
+        self._direction = self._hit_test_event(event)
+
+        if self._direction:
+            self._mode = "resize"
+            self._set_cursor_region(self._direction)
+            self.resize_started.emit()
+        else:
+            self._mode = "move"
+            self._set_cursor_region("default")
+
+    def move(self, event):
+        self.counters["events"] += 1
+        dragging = event.buttons() == Qt.MouseButton.LeftButton
+        if self._mode == "resize" and dragging:
+            self._request_geometry(self._resized_rect(event.globalPosition().toPoint()))
+        elif self._mode == "move" and dragging:
+            delta = event.globalPosition().toPoint() - self._initial_pos
+            self._request_geometry(self._initial_rect.translated(delta))
+        elif self._mode is None:
+            # 悬停：只在进入或离开边缘区域时更新鼠标形状
+            self._set_cursor_region(self._hit_test_event(event))
+
+    def release(self, event):
+        if event.button() != Qt.MouseButton.LeftButton or self._mode is None:
+            return
+        self._frame_timer.stop()
+        self._apply_pending()
+        mode = self._mode
+        self._mode = None
+        self._direction = None
+        self._initial_rect = None
+        self._initial_pos = None
+        if mode == "resize":
+            self.resize_finished.emit()
+        self._set_cursor_region(self._hit_test_event(event))
+
+    def leave(self):
+        """鼠标离开窗口时撤销覆盖指针（拖动中除外）"""
+        if self._mode is None:
+            self._set_cursor_region(None)
+
+    def _resized_rect(self, current_pos):
+        """根据调整方向计算新的几何信息"""
+        dx = current_pos.x() - self._initial_pos.x()
+        dy = current_pos.y() - self._initial_pos.y()
+        x = self._initial_rect.x()
+        y = self._initial_rect.y()
+        width = self._initial_rect.width()
+        height = self._initial_rect.height()
+        new_x, new_y, new_width, new_height = x, y, width, height
+
+        if "left" in self._direction:
+            new_x = x + dx
+            new_width = max(self.min_width, width - dx)
+            if new_width == self.min_width:
+                new_x = x + width - self.min_width
+
+        if "right" in self._direction:
+            new_width = max(self.min_width, width + dx)
+
+        if "top" in self._direction:
+            new_y = y + dy
+            new_height = max(self.min_height, height - dy)
+            if new_height == self.min_height:
+                new_y = y + height - self.min_height
+
+        if "bottom" in self._direction:
+            new_height = max(self.min_height, height + dy)
+
+        return QRect(new_x, new_y, new_width, new_height)
+
+    def _frame_interval(self):
+        """按所在屏幕的刷新率计算帧间隔（毫秒）"""
+        screen = self.window.screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return max(1, int(1000 / (rate or 60)))
+
+    def _request_geometry(self, rect):
+        """记录目标几何信息：空闲时立即应用，否则等到下一帧"""
+        self.counters["geometry_requests"] += 1
+        self._pending_rect = rect
+        if not self._frame_timer.isActive():
+            self._apply_pending()
+            self._frame_timer.start(self._frame_interval())
+
+    def _on_frame(self):
+        if self._pending_rect is not None:
+            self._apply_pending()
+            self._frame_timer.start(self._frame_interval())
+
+    def _apply_pending(self):
+        rect = self._pending_rect
+        if rect is None:
+            return
+        self._pending_rect = None
+        self.counters["geometry_applied"] += 1
+        if self._mode == "move":
+            self.window.move(rect.topLeft())
+        elif rect != self.window.geometry():
+            self.window.setGeometry(rect)
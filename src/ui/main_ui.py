@@ -3,7 +3,7 @@ from PySide6.QtWidgets import (QMainWindow, QVBoxLayout, QWidget,
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QCursor, QIcon
 
-from src.ui.custom_widgets import CustomTextEdit
+from src.ui.custom_widgets import TextView
 
 class MainUI:
     def setup_ui(self, window):
@@ -20,10 +20,8 @@ class MainUI:
         self.layout = QVBoxLayout(self.central_widget)
         self.layout.setContentsMargins(10, 10, 10, 10)
         
-        # 创建自定义文本编辑器（只读模式）
-        self.text_edit = CustomTextEdit()
-        self.text_edit.setReadOnly(True)
-        self.text_edit.setTextInteractionFlags(Qt.TextInteractionFlag.NoTextInteraction)
+        # 创建文本视图（只读，只排版和绘制可见的行）
+        self.text_edit = TextView()
         self.layout.addWidget(self.text_edit)
         
         # 设置初始窗口大小
@@ -1,7 +1,7 @@
 from PySide6.QtWidgets import (QMainWindow, QVBoxLayout, QWidget, QPushButton)
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QCursor
-from src.ui.custom_widgets import CustomTextEdit
+from src.ui.custom_widgets import TextView
 
 class MainWindowUI(QMainWindow):
     def __init__(self):
@@ -19,10 +19,8 @@ class MainWindowUI(QMainWindow):
         self.layout = QVBoxLayout(self.central_widget)
         self.layout.setContentsMargins(10, 10, 10, 10)
         
-        # 创建自定义文本编辑器（只读模式）
-        self.text_edit = CustomTextEdit()
-        self.text_edit.setReadOnly(True)
-        self.text_edit.setTextInteractionFlags(Qt.TextInteractionFlag.NoTextInteraction)
+        # 创建文本视图（只读，只排版和绘制可见的行）
+        self.text_edit = TextView()
         self.layout.addWidget(self.text_edit)
         
         # 设置初始窗口大小
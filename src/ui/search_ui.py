@@ -0,0 +1,31 @@
+from PySide6.QtWidgets import (QDialog, QLabel, QPushButton, QLineEdit, QListWidget,
+                               QVBoxLayout, QHBoxLayout)
+
+class SearchDialogUI(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.setWindowTitle("搜索")
+
+        # 设置对话框大小
+        self.resize(500, 400)
+
+        # 创建布局
+        self.layout = QVBoxLayout(self)
+
+        # 搜索框和按钮
+        self.queryLayout = QHBoxLayout()
+        self.queryEdit = QLineEdit()
+        self.queryEdit.setPlaceholderText("输入要查找的文字")
+        self.queryLayout.addWidget(self.queryEdit, 1)
+        self.searchBtn = QPushButton("搜索")
+        self.queryLayout.addWidget(self.searchBtn)
+        self.layout.addLayout(self.queryLayout)
+
+        # 搜索状态
+        self.statusLabel = QLabel("")
+        self.layout.addWidget(self.statusLabel)
+
+        # 搜索结果
+        self.resultList = QListWidget()
+        self.layout.addWidget(self.resultList)
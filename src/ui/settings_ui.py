@@ -1,5 +1,5 @@
-from PySide6.QtWidgets import (QDialog, QLabel, QPushButton, QSlider, 
-                              QGridLayout, QHBoxLayout)
+from PySide6.QtWidgets import (QDialog, QLabel, QPushButton, QSlider, QCheckBox, QLineEdit,
+                              QSpinBox, QGridLayout, QHBoxLayout)
 from PySide6.QtCore import Qt
 
 class SettingsDialogUI(QDialog):
@@ -9,7 +9,7 @@ class SettingsDialogUI(QDialog):
         self.setWindowTitle("设置")
         
         # 设置对话框大小
-        self.resize(500, 250)
+        self.resize(500, 480)
         
         # 创建布局
         self.layout = QGridLayout(self)
@@ -49,10 +49,51 @@ class SettingsDialogUI(QDialog):
         self.textAlphaSlider.setRange(0, 255)
         self.layout.addWidget(self.textAlphaSlider, 4, 1)
         
+        # 性能记录开关
+        self.layout.addWidget(QLabel("性能记录:"), 5, 0)
+        self.profilingCheck = QCheckBox("记录加载、排版、绘制耗时和内存占用")
+        self.layout.addWidget(self.profilingCheck, 5, 1)
+        
+        # 全局快捷键设置（如 ctrl+alt+h，留空表示不使用）
+        self.layout.addWidget(QLabel("老板键:"), 6, 0)
+        self.bossKeyEdit = QLineEdit()
+        self.layout.addWidget(self.bossKeyEdit, 6, 1)
+        
+        self.layout.addWidget(QLabel("上一页快捷键:"), 7, 0)
+        self.pageUpKeyEdit = QLineEdit()
+        self.layout.addWidget(self.pageUpKeyEdit, 7, 1)
+        
+        self.layout.addWidget(QLabel("下一页快捷键:"), 8, 0)
+        self.pageDownKeyEdit = QLineEdit()
+        self.layout.addWidget(self.pageDownKeyEdit, 8, 1)
+        
+        # 文本清理规则（各规则的勾选框由设置对话框按规则列表添加）
+        self.layout.addWidget(QLabel("文本清理:"), 9, 0)
+        self.cleanupLayout = QGridLayout()
+        self.layout.addLayout(self.cleanupLayout, 9, 1)
+        
+        self.layout.addWidget(QLabel("广告关键词:"), 10, 0)
+        self.adPatternEdit = QLineEdit()
+        self.adPatternEdit.setPlaceholderText("正则表达式，多个关键词用 | 分隔")
+        self.layout.addWidget(self.adPatternEdit, 10, 1)
+        
+        # 自动滚动速度（像素/秒）
+        self.layout.addWidget(QLabel("自动滚动速度:"), 11, 0)
+        self.scrollSpeedSlider = QSlider(Qt.Orientation.Horizontal)
+        self.layout.addWidget(self.scrollSpeedSlider, 11, 1)
+        
+        # 隐藏到托盘多久后释放内存（秒，0 表示不释放）
+        self.layout.addWidget(QLabel("隐藏后释放内存:"), 12, 0)
+        self.trimDelaySpin = QSpinBox()
+        self.trimDelaySpin.setRange(0, 24 * 3600)
+        self.trimDelaySpin.setSuffix(" 秒")
+        self.trimDelaySpin.setSpecialValueText("不释放")
+        self.layout.addWidget(self.trimDelaySpin, 12, 1)
+        
         # 保存和取消按钮
         self.buttonLayout = QHBoxLayout()
         self.saveBtn = QPushButton("保存")
         self.cancelBtn = QPushButton("取消")
         self.buttonLayout.addWidget(self.saveBtn)
         self.buttonLayout.addWidget(self.cancelBtn)
-        self.layout.addLayout(self.buttonLayout, 5, 0, 1, 2) 
\ No newline at end of file
+        self.layout.addLayout(self.buttonLayout, 13, 0, 1, 2) 
\ No newline at end of file
@@ -1,39 +1,58 @@
-from PySide6.QtGui import QColor
+from functools import lru_cache
+
+from PySide6.QtGui import QColor, QPalette
 
 class StyleManager:
     @staticmethod
-    def get_main_window_style(bg_color, bg_alpha, text_color, text_alpha):
-        """获取主窗口样式"""
-        return f"""
-            QWidget {{
-                background: rgba({bg_color.red()}, {bg_color.green()}, {bg_color.blue()}, {bg_alpha});
-                border: none;
-                border-radius: 5px;
-            }}
-            QTextEdit {{
-                border: none;
-                background: transparent;
-                color: rgba({text_color.red()}, {text_color.green()}, {text_color.blue()}, {text_alpha});
-                selection-background-color: transparent;
-                selection-color: inherit;
-            }}
-        """
-    
+    def get_background_color(bg_color, bg_alpha):
+        """获取窗口背景颜色（按颜色缓存）"""
+        return _background_color(bg_color.red(), bg_color.green(), bg_color.blue(), bg_alpha)
+
+    @staticmethod
+    def get_text_palette(text_color, text_alpha):
+        """获取文本区域调色板：透明底色、指定颜色的文字、不显示选区（按颜色缓存）"""
+        return _text_palette(text_color.red(), text_color.green(), text_color.blue(), text_alpha)
+
     @staticmethod
     def get_button_style(bg_color, text_color, text_alpha):
-        """获取按钮样式"""
-        return f"""
-            QPushButton {{
-                background-color: rgba({bg_color.red()}, {bg_color.green()}, {bg_color.blue()}, 50);
-                color: rgba({text_color.red()}, {text_color.green()}, {text_color.blue()}, {text_alpha});
-                border: none;
-                border-radius: 3px;
-                padding: 5px;
-                font-size: 16px;
-                min-width: 30px;
-                min-height: 30px;
-            }}
-            QPushButton:hover {{
-                background-color: rgba({bg_color.red()}, {bg_color.green()}, {bg_color.blue()}, 100);
-            }}
-        """ 
\ No newline at end of file
+        """获取按钮样式（按颜色缓存）"""
+        return _button_style(bg_color.red(), bg_color.green(), bg_color.blue(),
+                             text_color.red(), text_color.green(), text_color.blue(), text_alpha)
+
+
+@lru_cache(maxsize=64)
+def _background_color(red, green, blue, alpha):
+    return QColor(red, green, blue, alpha)
+
+
+@lru_cache(maxsize=64)
+def _text_palette(red, green, blue, alpha):
+    palette = QPalette()
+    transparent = QColor(0, 0, 0, 0)
+    text = QColor(red, green, blue, alpha)
+    for group in (QPalette.ColorGroup.Active, QPalette.ColorGroup.Inactive):
+        palette.setColor(group, QPalette.ColorRole.Base, transparent)
+        palette.setColor(group, QPalette.ColorRole.Window, transparent)
+        palette.setColor(group, QPalette.ColorRole.Text, text)
+        palette.setColor(group, QPalette.ColorRole.Highlight, transparent)
+        palette.setColor(group, QPalette.ColorRole.HighlightedText, text)
+    return palette
+
+
+@lru_cache(maxsize=64)
+def _button_style(bg_red, bg_green, bg_blue, text_red, text_green, text_blue, text_alpha):
+    return f"""
+        QPushButton {{
+            background-color: rgba({bg_red}, {bg_green}, {bg_blue}, 50);
+            color: rgba({text_red}, {text_green}, {text_blue}, {text_alpha});
+            border: none;
+            border-radius: 3px;
+            padding: 5px;
+            font-size: 16px;
+            min-width: 30px;
+            min-height: 30px;
+        }}
+        QPushButton:hover {{
+            background-color: rgba({bg_red}, {bg_green}, {bg_blue}, 100);
+        }}
+    """
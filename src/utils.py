@@ -1,8 +1,21 @@
 import ctypes
+import sys
 
 def is_admin():
     """检查程序是否以管理员权限运行"""
     try:
         return ctypes.windll.shell32.IsUserAnAdmin() != 0
     except:
-        return False 
\ No newline at end of file
+        return False
+
+
+def trim_process_memory():
+    """把已经释放的内存归还给操作系统（Windows 缩小工作集，Linux 调用 malloc_trim）"""
+    try:
+        if sys.platform == 'win32':
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetProcessWorkingSetSize(kernel32.GetCurrentProcess(), ctypes.c_size_t(-1), ctypes.c_size_t(-1))
+        elif sys.platform.startswith('linux'):
+            ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass 
\ No newline at end of file